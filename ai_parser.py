@@ -1,9 +1,56 @@
-import re
 import logging
 
+import gazetteer
+import hebrew_text
+import keyword_engine
+import parse_cache
+import title_model
+
+# Each title is tokenized once (hebrew_text.tokenize_title) and the same tokens go to every field parser,
+# the gazetteer and the title model. The parsers look tokens up in sets and dicts (years, units, brands)
+# rather than scanning the title, since they run for every deal the cache hasn't seen. Brands, categories
+# and deal-type words live in taxonomy.json and are matched by keyword_engine.
+CAR_BRANDS = keyword_engine.group_terms("car_brand")
+# A title naming several categories or brands gets the one listed first in the taxonomy, as the original
+# `in` checks did (שעון סמסונג is a phone, not jewelry)
+EQUIPMENT_CATEGORIES = keyword_engine.group_terms("equipment_category")
+EQUIPMENT_BRANDS = keyword_engine.group_terms("equipment_brand")
+
+# Year: 4 digits, 1990 up to 2029, as whole number tokens
+YEAR_RANGE = (1990, 2029)
+YEARS = frozenset(str(year) for year in range(YEAR_RANGE[0], YEAR_RANGE[1] + 1))
+# Units that may follow a number, in any quote/geresh spelling (folded like the tokens)
+ROOM_UNITS = hebrew_text.folded_set(["חדרים", "חד'"])
+AREA_UNITS = hebrew_text.folded_set(['מ"ר', "מטר", "מ'", "מ'ר"])
+QUANTITY_UNITS = ROOM_UNITS | AREA_UNITS
+
+
+def _tokens(title):
+    return hebrew_text.tokenize_title(title) if isinstance(title, str) else title
+
+
+def find_year(title):
+    year = next(filter(YEARS.__contains__, title.norms), None)
+    return int(year) if year else None
+
+
+def find_quantities(title):
+    """
+    (rooms, area): the value of the first number token directly followed by a room unit, and by an area unit.
+    """
+    rooms = area = None
+    tokens = title.tokens
+    for i in hebrew_text.positions(title.norms, QUANTITY_UNITS):
+        if i and tokens[i - 1].kind == "number":
+            if rooms is None and title.norms[i] in ROOM_UNITS:
+                rooms = hebrew_text.number_value(tokens[i - 1])
+            elif area is None and title.norms[i] in AREA_UNITS:
+                area = hebrew_text.number_value(tokens[i - 1])
+    return rooms, area
+
 def parse_car_title(title):
     """
-    Extracts structured data from a raw car auction title using Regular Expressions.
+    Extracts structured data from a raw car auction title (or its hebrew_text.tokenize_title()).
     Example Input: "מכרז מס' 45/2026 - רכב שברולט ספארק שנת 2019"
     """
     data = {
@@ -12,34 +59,27 @@ def parse_car_title(title):
         "raw_extracted": False
     }
     
+    title = _tokens(title)
+
     # Extract Year (4 digits, starting with 19 or 20, up to current year+1)
-    year_match = re.search(r'\b(19[9-9]\d|20[0-2]\d)\b', title)
-    if year_match:
-        data["year"] = int(year_match.group(1))
+    data["year"] = find_year(title)
         
     # Extract Make/Model (naive approach: common car brands in Israel)
-    brands = ["שברולט", "יונדאי", "מאזדה", "טויוטה", "קיה", "רנו", "פיג'ו", "סיטרואן", 
-              "פורד", "סובארו", "סוזוקי", "מיצובישי", "ניסאן", "הונדה", "פולקסווגן", 
-              "סקודה", "סיאט", "אאודי", "מזראטי", "ב.מ.וו", "מרצדס", "טסלה"]
-              
-    for brand in brands:
-        if brand in title:
-            # Try to grab the brand and the word immediately following it as the model
-            pattern = rf'{brand}\s+([א-ת0-9A-Za-z]+)'
-            model_match = re.search(pattern, title)
-            if model_match:
-                data["model"] = f"{brand} {model_match.group(1)}"
-            else:
-                data["model"] = brand
-            data["raw_extracted"] = True
-            break
+    # The first brand in the title, as whole words; the word right after it (past whitespace only) is the model
+    brand_hit = keyword_engine.first_token_match(title.norms, "car_brand")
+    if brand_hit:
+        _, brand_end, brand = brand_hit
+        model = title.tokens[brand_end] if brand_end < len(title.tokens) else None
+        separated = model is not None and model.spaced and model.kind != "punct"
+        data["model"] = f"{brand} {model.text}" if separated else brand
+        data["raw_extracted"] = True
             
     return data
 
 
 def parse_real_estate_title(title):
     """
-    Extracts structured data from a raw real estate auction title.
+    Extracts structured data from a raw real estate auction title (or its hebrew_text.tokenize_title()).
     Example Input: "מכרז פומבי למכירת דירת 4 חדרים בחיפה, רחוב הרצל 15, כ-100 מ\"ר"
     """
     data = {
@@ -49,32 +89,21 @@ def parse_real_estate_title(title):
         "raw_extracted": False
     }
     
-    # Extract Rooms (Number followed by "חדרים" or "חד'")
-    rooms_match = re.search(r'(\d+([\.,]\d)?)\s*(חדרים|חד\')', title)
-    if rooms_match:
-        try:
-            data["rooms"] = float(rooms_match.group(1))
-            data["raw_extracted"] = True
-        except ValueError:
-            pass
-            
-    # Extract Area in Sqm (Number followed by "מ"ר" or "מטר")
-    area_match = re.search(r'(\d+([\.,]\d)?)\s*(מ"ר|מטר|מ׳|מ\'ר)', title)
-    if area_match:
-        try:
-            data["area_sqm"] = float(area_match.group(1))
-            data["raw_extracted"] = True
-        except ValueError:
-            pass
-            
-    # Extract City (basic matching after common prefixes like 'ב-')
-    # Or just rely on the 'timeLeft' field from the scraper which usually holds the city/location.
+    title = _tokens(title)
+
+    # Extract Rooms (Number followed by "חדרים" or "חד'") and Area in Sqm (Number followed by "מ"ר" or "מטר")
+    data["rooms"], data["area_sqm"] = find_quantities(title)
+    # Extract City: the first locality the gazetteer recognizes in the title
+    localities = gazetteer.find_localities_in_words(title.words)
+    if localities:
+        data["city"] = localities[0].name
+    data["raw_extracted"] = any(data[k] is not None for k in ("rooms", "area_sqm", "city"))
     
     return data
 
 def parse_equipment_title(title):
     """
-    Extracts structured data from a raw equipment/hardware auction title.
+    Extracts structured data from a raw equipment/hardware auction title (or its hebrew_text.tokenize_title()).
     Example Input: "מכרז למכירת מחשב נייד אפל מקבוק פרו מחולט"
     """
     data = {
@@ -83,20 +112,15 @@ def parse_equipment_title(title):
         "raw_extracted": False
     }
     
-    categories = {"מחשב": "מחשבים", "אייפון": "סלולר", "סמסונג": "סלולר", "טלפון": "סלולר", "שעון": "תכשיטים ושעונים", "תכשיט": "תכשיטים ושעונים", "רהיט": "ריהוט", "כלי עבודה": "כלי עבודה"}
-    brands = ["אפל", "Apple", "סמסונג", "Samsung", "דל", "Dell", "HP", "לנובו", "Lenovo", "רולקס", "Rolex"]
-    
-    for cat_keyword, cat_name in categories.items():
-        if cat_keyword in title:
-            data["category"] = cat_name
-            data["raw_extracted"] = True
-            break
+    # One pass over the title finds every category and brand keyword; of each, the taxonomy's first wins
+    hits = keyword_engine.scan(_tokens(title).folded, folded=True)
+    if "equipment_category" in hits:
+        data["category"] = min(hits["equipment_category"], key=EQUIPMENT_CATEGORIES.index)
+        data["raw_extracted"] = True
             
-    for brand in brands:
-        if brand.lower() in title.lower():
-            data["brand"] = brand
-            data["raw_extracted"] = True
-            break
+    if "equipment_brand" in hits:
+        data["brand"] = min(hits["equipment_brand"], key=EQUIPMENT_BRANDS.index)
+        data["raw_extracted"] = True
             
     return data
 
@@ -129,28 +153,124 @@ def enrich_deep_data(deal):
     
     return deal
 
+# Cached parse results are dropped whenever this file, the taxonomy or the gazetteer changes. The cache only
+# holds what the rules extract; title model predictions are applied on top, so retraining the model
+# doesn't invalidate it.
+PARSER_VERSION = parse_cache.rules_version(__file__, keyword_engine.__file__, hebrew_text.__file__,
+                                           gazetteer.__file__, keyword_engine.TAXONOMY_FILEPATH,
+                                           gazetteer.GAZETTEER_FILEPATH)
+parse_cache.configure(PARSER_VERSION)
+
+TITLE_PARSERS = {
+    "car": parse_car_title,
+    "real_estate": parse_real_estate_title,
+    "equipment": parse_equipment_title,
+}
+
+# Deal field <- title model field, per deal type (a car's "model" is built from make + model below)
+MODEL_FIELDS = {
+    "car": {"year": "year"},
+    "real_estate": {"rooms": "rooms", "area_sqm": "area", "city": "city"},
+    "equipment": {"category": "category", "brand": "make"},
+}
+
+def missing_fields(deal_type, data):
+    """
+    Fields the title model could fill that the rules left empty.
+    """
+    fields = [field for field in MODEL_FIELDS.get(deal_type, {}) if data.get(field) is None]
+    if deal_type == "car" and data.get("model") is None:
+        fields.append("model")
+    return fields
+
+def apply_prediction(deal_type, data, prediction):
+    """
+    Fill fields the rules left empty with the title model's values where it is confident. The rules always
+    win, and every field the model filled is listed in data["model_fields"] so training skips it
+    (the model learns from rule output only, never from its own predictions).
+    """
+    if not prediction:
+        return data
+    filled = []
+    for field in missing_fields(deal_type, data):
+        if field == "model":
+            make = title_model.confident(prediction, "make")
+            if make:
+                model = title_model.confident(prediction, "model")
+                data["model"] = f"{make} {model}" if model else make
+                filled.append("model")
+            continue
+        value = title_model.confident(prediction, MODEL_FIELDS[deal_type][field])
+        if value is not None:
+            data[field] = value
+            filled.append(field)
+    if filled:
+        data["model_fields"] = filled
+        data["raw_extracted"] = True
+    return data
+
 def parse_deal(deal):
     """
     Main entry point to parse a deal object and enrich it with structured data.
     """
-    try:
-        enriched_data = {}
-        if deal.get('type') == 'car':
-            enriched_data = parse_car_title(deal.get('title', ''))
-        elif deal.get('type') == 'real_estate':
-            enriched_data = parse_real_estate_title(deal.get('title', ''))
-        elif deal.get('type') == 'equipment':
-            enriched_data = parse_equipment_title(deal.get('title', ''))
-            
-        # Merge new attributes into the deal
-        for k, v in enriched_data.items():
-            if v is not None:
-                deal[k] = v
-                
-        # Append mock deep data (Images, Extended Specs)
-        deal = enrich_deep_data(deal)
-                
-    except Exception as e:
-        logging.warning(f"Failed to parse deal {deal.get('id')}: {e}")
-        
-    return deal
+    return parse_deals([deal])[0]
+
+def parse_deals(deals):
+    """
+    Batch entry point: parse every deal of an iterable and return them as a list.
+    Titles missing from the parse cache go through the rules; titles whose rules left fields empty then
+    go through the title model as one batch. A title is tokenized at most once, on first need, and its
+    tokens are shared by the rules, the model and the gazetteer.
+    """
+    deals = list(deals)
+    parsed = [None] * len(deals)
+    titles = [None] * len(deals)
+
+    def title_tokens(i):
+        if titles[i] is None:
+            titles[i] = hebrew_text.tokenize_title(deals[i].get('title', ''))
+        return titles[i]
+
+    misses = []
+    for i, deal in enumerate(deals):
+        if deal.get('type') in TITLE_PARSERS:
+            parsed[i] = parse_cache.lookup(deal['type'], deal.get('title', ''))
+            if parsed[i] is None:
+                misses.append(i)
+
+    for i in misses:
+        deal = deals[i]
+        try:
+            parsed[i] = TITLE_PARSERS[deal['type']](title_tokens(i))
+            parse_cache.store(deal['type'], deal.get('title', ''), parsed[i])
+        except Exception as e:
+            logging.warning(f"Failed to parse deal {deal.get('id')}: {e}")
+
+    # Fields the source itself provided (e.g. Merkava's make, model and year) win over the title rules
+    for i, data in enumerate(parsed):
+        if data is not None:
+            data.update((k, deals[i][k]) for k in list(data) if deals[i].get(k) is not None)
+
+    # The model only sees titles the rules couldn't fully parse, as one batch
+    gaps = [i for i, data in enumerate(parsed) if data is not None and missing_fields(deals[i]['type'], data)]
+    predictions = title_model.predict_batch([title_tokens(i) for i in gaps])
+    for i, prediction in zip(gaps, predictions):
+        parsed[i] = apply_prediction(deals[i]['type'], parsed[i], prediction)
+
+    for i, deal in enumerate(deals):
+        try:
+            # Merge new attributes into the deal
+            for k, v in (parsed[i] or {}).items():
+                if v is not None:
+                    deal[k] = v
+
+            # City, district and coordinates from the location fields (or the title)
+            gazetteer.locate_deal(deal, title_tokens=titles[i])
+
+            # Append mock deep data (Images, Extended Specs)
+            deals[i] = enrich_deep_data(deal)
+
+        except Exception as e:
+            logging.warning(f"Failed to parse deal {deal.get('id')}: {e}")
+
+    return deals
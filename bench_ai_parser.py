@@ -0,0 +1,111 @@
+"""
+Throughput of ai_parser.parse_deals on synthetic Hebrew auction titles, compared with the original
+per-call regex scans (kept below as legacy_* for reference). Run: python bench_ai_parser.py [count]
+Each row is the best of REPEATS runs; the tokenized rows start every run with an empty chunk memo and
+include tokenizing the title, as a parse cache miss in parse_deals does.
+"""
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+import ai_parser
+import hebrew_text
+import parse_cache
+
+REPEATS = 5
+
+CITIES = ["חיפה", "תל אביב", "ירושלים", "באר שבע", "רמלה", "נתניה", "אשדוד"]
+MODELS = ["ספארק", "i20", "3", "קורולה", "פיקנטו", "קליאו", "208", "C3", "פוקוס", "XV", "סוויפט", "אאוטלנדר"]
+EQUIPMENT = ["מחשב נייד אפל מקבוק", "טלפון סמסונג גלקסי", "שעון רולקס", "רהיטי משרד", "כלי עבודה מקיטה", "מדפסת HP"]
+
+
+def synthetic_deals(count, seed=7):
+    rng = random.Random(seed)
+    deals = []
+    for i in range(count):
+        kind = rng.choice(["car", "real_estate", "equipment"])
+        if kind == "car":
+            title = f"מכרז מס' {i}/2026 - רכב {rng.choice(ai_parser.CAR_BRANDS)} {rng.choice(MODELS)} שנת {rng.randint(1995, 2025)}"
+        elif kind == "real_estate":
+            title = f"מכרז פומבי למכירת דירת {rng.randint(2, 6)} חדרים ב{rng.choice(CITIES)}, כ-{rng.randint(50, 180)} מ\"ר"
+        else:
+            title = f"מכרז למכירת {rng.choice(EQUIPMENT)} מחולט ({i})"
+        deals.append({"id": f"bench_{i}", "type": kind, "title": title})
+    return deals
+
+
+def legacy_parse_car_title(title):
+    data = {"year": None, "model": None, "raw_extracted": False}
+    year_match = re.search(r'\b(19[9-9]\d|20[0-2]\d)\b', title)
+    if year_match:
+        data["year"] = int(year_match.group(1))
+    for brand in ai_parser.CAR_BRANDS:
+        if brand in title:
+            model_match = re.search(rf'{brand}\s+([א-ת0-9A-Za-z]+)', title)
+            data["model"] = f"{brand} {model_match.group(1)}" if model_match else brand
+            data["raw_extracted"] = True
+            break
+    return data
+
+
+def legacy_parse_real_estate_title(title):
+    data = {"rooms": None, "area_sqm": None, "city": None, "raw_extracted": False}
+    rooms_match = re.search(r'(\d+([\.,]\d)?)\s*(חדרים|חד\')', title)
+    if rooms_match:
+        data["rooms"] = float(rooms_match.group(1))
+    area_match = re.search(r'(\d+([\.,]\d)?)\s*(מ"ר|מטר|מ׳|מ\'ר)', title)
+    if area_match:
+        data["area_sqm"] = float(area_match.group(1))
+    return data
+
+
+def legacy_parse_titles(deals):
+    for deal in deals:
+        if deal["type"] == "car":
+            legacy_parse_car_title(deal["title"])
+        elif deal["type"] == "real_estate":
+            legacy_parse_real_estate_title(deal["title"])
+        else:
+            ai_parser.parse_equipment_title(deal["title"])
+
+
+def current_parse_titles(deals):
+    hebrew_text._chunks.clear()
+    for deal in deals:
+        ai_parser.TITLE_PARSERS[deal["type"]](hebrew_text.tokenize_title(deal["title"]))
+
+
+def cold_parse_deals(deals):
+    hebrew_text._chunks.clear()
+    # A parser version nothing was stored under, so every title misses both cache tiers
+    parse_cache.configure(f"bench-{time.perf_counter_ns()}")
+    ai_parser.parse_deals(dict(deal) for deal in deals)
+
+
+def timed(label, func, deals):
+    elapsed = float("inf")
+    for _ in range(REPEATS):
+        started = time.perf_counter()
+        func(deals)
+        elapsed = min(elapsed, time.perf_counter() - started)
+    print(f"{label:<32}{elapsed * 1000:>10.1f} ms {len(deals) / elapsed:>12,.0f} titles/s")
+    return elapsed
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    deals = synthetic_deals(count)
+    parse_cache.PARSE_CACHE_FILEPATH = os.path.join(tempfile.mkdtemp(), "parse_cache.json")
+    print(f"{count:,} synthetic titles")
+    for kind in ("car", "real_estate"):
+        subset = [d for d in deals if d["type"] == kind]
+        legacy = timed(f"legacy {kind}", legacy_parse_titles, subset)
+        current = timed(f"tokenized {kind}", current_parse_titles, subset)
+        print(f"{kind} speedup: {legacy / current:.1f}x")
+    timed("parse_deals (all, cold cache)", cold_parse_deals, deals)
+
+
+if __name__ == "__main__":
+    main()
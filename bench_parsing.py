@@ -0,0 +1,52 @@
+"""
+Measure html_parse against the original full-tree BeautifulSoup(html, 'html.parser') + get_text split
+on the saved page fixtures. Run: python bench_parsing.py [repeats]
+"""
+import sys
+import time
+from bs4 import BeautifulSoup
+import html_parse
+
+FIXTURES = ["ila_source.html", "sibet.html", "tax_auth.html", "receiver.html"]
+
+
+def baseline(html):
+    soup = BeautifulSoup(html, 'html.parser')
+    blocks = soup.get_text(separator='|', strip=True).split('|')
+    rows = [[c.get_text(strip=True) for c in row.find_all('td')] for row in soup.find_all('tr')]
+    return blocks, rows
+
+
+def fast(html, backend=None):
+    page = html_parse.ParsedPage(html, backend=backend)
+    return page.text_blocks(), page.table_rows()
+
+
+def timeit(func, html, repeats):
+    started = time.perf_counter()
+    for _ in range(repeats):
+        func(html)
+    return (time.perf_counter() - started) / repeats * 1000
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    backends = [("html.parser", lambda h: fast(h, "html.parser")),
+                ("html.parser rows only", lambda h: html_parse.ParsedPage(h, only=["tr"], backend="html.parser").table_rows())]
+    if html_parse.HAVE_LXML:
+        backends.append(("lxml", lambda h: fast(h, "lxml")))
+
+    print(f"{'fixture':<16}{'KB':>6}{'baseline ms':>14}" + "".join(f"{name + ' ms':>26}" for name, _ in backends))
+    for fixture in FIXTURES:
+        with open(fixture, 'r', encoding='utf-8') as f:
+            html = f.read()
+        base_ms = timeit(baseline, html, repeats)
+        line = f"{fixture:<16}{len(html.encode('utf-8')) // 1024:>6}{base_ms:>14.1f}"
+        for name, func in backends:
+            ms = timeit(func, html, repeats)
+            line += f"{f'{ms:.1f} ({base_ms / ms:.1f}x)':>26}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
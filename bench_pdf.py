@@ -0,0 +1,94 @@
+"""
+Page extraction time of pdf_extract on a generated multi-page PDF: serial on one thread against
+page-range shards on the process pool, plus the lazy stop once a risk keyword is found.
+Run: python bench_pdf.py [pages] [processes]
+"""
+import io
+import os
+import sys
+import time
+import pdf_analyzer
+import pdf_extract
+
+LINES_PER_PAGE = 45
+KEYWORD = "TOTALLOSS"
+FILLER = "Lot %d: auction terms, inspection dates and payment schedule for the receivership asset, line %d"
+
+
+def make_pdf(page_texts):
+    """
+    Minimal PDF with one Helvetica text page per entry of page_texts (a list of lines).
+    """
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_ids = []
+    for lines in page_texts:
+        ops = ["BT /F1 10 Tf 12 TL 40 760 Td"] + [f"({line}) Tj T*" for line in lines] + ["ET"]
+        stream = "\n".join(ops).encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents {len(objects)} 0 R "
+                       f"/Resources << /Font << /F1 3 0 R >> >> >>".encode())
+        page_ids.append(len(objects))
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(f'{i} 0 R' for i in page_ids)}] /Count {len(page_ids)} >>".encode()
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+def report(label, pages, elapsed, baseline=None, note=""):
+    speedup = f"  x{baseline / elapsed:.1f}" if baseline else ""
+    print(f"{label:<34} {pages:>5} pages  {elapsed:7.2f}s{speedup}{note}")
+    return elapsed
+
+
+def timed_extract(label, extractor, baseline=None):
+    started = time.perf_counter()
+    count = sum(1 for _ in extractor)
+    return report(label, count, time.perf_counter() - started, baseline,
+                  "  (timed out)" if extractor.timed_out else "")
+
+
+def timed_scan(label, extractor, baseline=None):
+    started = time.perf_counter()
+    scanner = pdf_analyzer.scan_pages(extractor, max_pages=extractor.page_count)
+    return report(label, scanner.pages, time.perf_counter() - started, baseline,
+                  f"  (found {scanner.found()} on page {scanner.hits.get(KEYWORD, {}).get('page')})")
+
+
+def main():
+    page_count = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    processes = int(sys.argv[2]) if len(sys.argv) > 2 else max(2, pdf_extract.EXTRACT_PROCESSES)
+    # The shared pool is sized from this on first use
+    pdf_extract.EXTRACT_PROCESSES = processes
+    # Latin-only Helvetica text, so the risk keyword used for the lazy-stop run is an ASCII token
+    pdf_analyzer.RISK_KEYWORDS = [KEYWORD]
+    pdf_analyzer.RISK_PHRASES, pdf_analyzer.RISK_MAX_WORDS = pdf_analyzer.compile_risk_phrases(pdf_analyzer.RISK_KEYWORDS)
+    keyword_page = page_count // 4
+    texts = [[FILLER % (page, line) for line in range(LINES_PER_PAGE)] for page in range(page_count)]
+    texts[keyword_page][LINES_PER_PAGE // 2] = f"Vehicle declared {KEYWORD} after the accident"
+    data = make_pdf(texts)
+    print(f"{page_count} pages, {len(data) // 1024} KB, {os.cpu_count()} CPUs, pool of {processes} processes\n")
+
+    def extractor(**kwargs):
+        return pdf_extract.PageExtractor(io.BytesIO(data), **kwargs)
+
+    # Spawn the pool (and let each worker import PyPDF2) before timing
+    list(extractor(end=pdf_extract.MIN_PARALLEL_PAGES, processes=processes))
+
+    serial = timed_extract("serial, every page", extractor(processes=1))
+    timed_extract("process pool, every page", extractor(processes=processes), serial)
+    timed_scan("serial, stop at keyword", extractor(processes=1), serial)
+    timed_scan("process pool, stop at keyword", extractor(processes=processes), serial)
+    budget = serial / 10
+    timed_extract(f"process pool, {budget:.2f}s budget", extractor(processes=processes, time_budget=budget), serial)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 import logging
+import gazetteer
 
 # Simple mock database for baseline car prices (New 2026 pricing logic)
 CAR_BASE_PRICES = {
@@ -16,6 +17,8 @@ REAL_ESTATE_BASE = {
     "center": 800000, # Per room
     "periphery": 450000
 }
+# Districts (as named in localities.json) priced as center
+CENTER_DISTRICTS = {"תל אביב", "ירושלים"}
 
 def estimate_car_value(deal):
     """
@@ -50,8 +53,12 @@ def estimate_real_estate_value(deal):
     rooms = deal.get("rooms")
     area = deal.get("area_sqm")
     
-    # Assume center if Tel Aviv/Ramat Gan/Herzliya etc are in title
-    price_per_room = REAL_ESTATE_BASE["center"] if any(x in title for x in ["תל אביב", "ת\"א", "רמת גן", "הרצליה", "גבעתיים", "ירושלים"]) else REAL_ESTATE_BASE["periphery"]
+    # Center pricing for the Tel Aviv and Jerusalem districts, from the deal's locality (or the title's)
+    district = deal.get("district")
+    if district is None:
+        locality = gazetteer.find_locality(title)
+        district = locality.district if locality else None
+    price_per_room = REAL_ESTATE_BASE["center"] if district in CENTER_DISTRICTS else REAL_ESTATE_BASE["periphery"]
     
     market_value = 1500000 # Default
     
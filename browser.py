@@ -0,0 +1,219 @@
+import base64
+import json
+import logging
+import os
+import threading
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
+from webdriver_manager.chrome import ChromeDriverManager
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+
+# Request-blocking profiles applied through CDP Network.setBlockedURLs.
+# The scrapers only read page_source/text, so images, fonts, stylesheets, media and trackers are dead weight.
+BLOCK_PROFILES = {
+    "none": [],
+    "text_only": [
+        "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.svg", "*.ico",
+        "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot",
+        "*.css",
+        "*.mp4", "*.webm", "*.mp3",
+        "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*",
+        "*facebook.net*", "*hotjar.com*",
+    ],
+}
+DEFAULT_BLOCK_PROFILE = os.environ.get('BROWSER_BLOCK_PROFILE', 'text_only')
+
+_driver_path = None
+_driver_path_lock = threading.Lock()
+
+def build_chrome_options():
+    """
+    Headless Chrome options shared by every scraper worker.
+    """
+    chrome_options = Options()
+    chrome_options.add_argument("--headless")
+    chrome_options.add_argument("--no-sandbox")
+    chrome_options.add_argument("--disable-dev-shm-usage")
+    chrome_options.add_argument("--disable-gpu")
+    chrome_options.add_argument("window-size=1920,1080")
+    chrome_options.add_argument(f"user-agent={USER_AGENT}")
+    # Performance logs carry the DevTools Network events used to capture XHR JSON payloads
+    chrome_options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+    return chrome_options
+
+def get_driver_path():
+    """
+    Resolve the chromedriver binary once per process.
+    ChromeDriverManager().install() does a network version check, so parallel workers share the result.
+    """
+    global _driver_path
+    with _driver_path_lock:
+        if _driver_path is None:
+            _driver_path = ChromeDriverManager().install()
+    return _driver_path
+
+def create_driver():
+    """
+    Start a new headless ChromeDriver instance with the default request-blocking profile.
+    """
+    service = Service(get_driver_path())
+    driver = webdriver.Chrome(service=service, options=build_chrome_options())
+    apply_block_profile(driver)
+    return driver
+
+def apply_block_profile(driver, profile=None, allow=()):
+    """
+    Block the URL patterns of a profile for every following request on this driver.
+    `allow` removes patterns from the profile for sites whose rendering needs them (e.g. ["*.css"]).
+    """
+    profile = profile or DEFAULT_BLOCK_PROFILE
+    patterns = [p for p in BLOCK_PROFILES.get(profile, []) if p not in allow]
+    try:
+        driver.execute_cdp_cmd('Network.enable', {})
+        driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': patterns})
+    except Exception as e:
+        logging.warning(f"Failed to apply request-blocking profile '{profile}': {e}")
+
+def quit_driver(driver):
+    """
+    Quit a driver, ignoring errors from an already dead browser.
+    """
+    if driver is None:
+        return
+    try:
+        driver.quit()
+    except Exception as e:
+        logging.warning(f"Failed to quit ChromeDriver cleanly: {e}")
+
+
+class NetworkCapture:
+    """
+    Collects JSON XHR/fetch responses from a driver's DevTools performance log.
+    A response is only read (via CDP Network.getResponseBody) once its loadingFinished event arrived,
+    so poll() can be called repeatedly while the page is still loading.
+    """
+
+    def __init__(self, driver, url_filter=None):
+        self.driver = driver
+        self.url_filter = url_filter
+        self._pending = {}
+        self._finished = set()
+
+    def drain(self):
+        """
+        Discard log entries from earlier navigations.
+        """
+        try:
+            self.driver.get_log('performance')
+        except Exception:
+            pass
+
+    def poll(self):
+        """
+        Return a list of (url, decoded JSON) for responses that finished since the last poll.
+        """
+        try:
+            entries = self.driver.get_log('performance')
+        except Exception as e:
+            logging.warning(f"Performance log unavailable: {e}")
+            return []
+
+        for entry in entries:
+            try:
+                message = json.loads(entry['message'])['message']
+            except (KeyError, ValueError):
+                continue
+            method = message.get('method')
+            params = message.get('params', {})
+            if method == 'Network.responseReceived':
+                response = params.get('response', {})
+                if 'json' not in response.get('mimeType', ''):
+                    continue
+                if self.url_filter and self.url_filter not in response.get('url', ''):
+                    continue
+                self._pending[params['requestId']] = response.get('url', '')
+            elif method == 'Network.loadingFinished' and params.get('requestId') in self._pending:
+                self._finished.add(params['requestId'])
+
+        captured = []
+        for request_id in [r for r in self._pending if r in self._finished]:
+            url = self._pending.pop(request_id)
+            self._finished.discard(request_id)
+            try:
+                body = self.driver.execute_cdp_cmd('Network.getResponseBody', {'requestId': request_id})
+                text = body.get('body', '')
+                if body.get('base64Encoded'):
+                    text = base64.b64decode(text).decode('utf-8')
+                captured.append((url, json.loads(text)))
+            except Exception as e:
+                logging.debug(f"Could not read response body for {url}: {e}")
+        return captured
+
+
+class LazyDriver:
+    """
+    Stand-in for a ChromeDriver that only starts Chrome on first use.
+    Sources that are served by direct HTTP never pay for a browser.
+    Once quit it refuses to start again, so an abandoned scraper thread can't spawn a new Chrome.
+    """
+
+    def __init__(self):
+        self._driver = None
+        self._closed = False
+
+    @property
+    def started(self):
+        return self._driver is not None
+
+    def __getattr__(self, name):
+        if self._closed:
+            raise RuntimeError("ChromeDriver was quit")
+        if self._driver is None:
+            logging.info("Starting ChromeDriver on first use...")
+            self._driver = create_driver()
+        return getattr(self._driver, name)
+
+    def quit(self):
+        self._closed = True
+        quit_driver(self._driver)
+        self._driver = None
+
+
+class WarmDriver(LazyDriver):
+    """
+    Long-lived driver for the daemon: started on first use and kept warm between runs.
+    prepare() is called between sources; it health-checks the browser and recycles it (quit, restarted
+    lazily) when it is dead or has served max_pages navigations, to bound Chrome's memory growth.
+    """
+
+    def __init__(self, max_pages=50):
+        super().__init__()
+        self.max_pages = max_pages
+        self.pages = 0
+
+    def is_healthy(self):
+        if self._driver is None:
+            return True
+        try:
+            return self._driver.execute_script("return 1") == 1
+        except Exception:
+            return False
+
+    def recycle(self, reason="recycle"):
+        if self._driver is not None:
+            logging.info(f"Restarting ChromeDriver ({reason}, {self.pages} pages served)")
+            quit_driver(self._driver)
+        self._driver = None
+        self.pages = 0
+
+    def prepare(self):
+        if self.pages >= self.max_pages:
+            self.recycle(f"page limit {self.max_pages}")
+        elif not self.is_healthy():
+            self.recycle("failed health check")
+
+    def get(self, url):
+        self.pages += 1
+        return self.__getattr__('get')(url)
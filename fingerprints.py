@@ -0,0 +1,127 @@
+import copy
+import hashlib
+import json
+import logging
+import os
+import threading
+
+# Incremental scraping: every raw deal (the normalized API item / table row a scraper produced, minus its
+# positional id) is hashed. If a source hands us the same raw deal as last run, the enriched deal stored
+# from that run is reused instead of going through ai_parser, pdf_links, pdf_analyzer and benchmark again.
+# Deal fingerprints include the enrichment version (see configure), so a change to the parser rules or
+# the risk vocabulary re-enriches every deal once.
+FINGERPRINTS_FILEPATH = os.path.join('.cache', 'fingerprints.json')
+# Bump when an enrichment stage changes in a way the configured component versions don't capture
+STAGE_VERSION = 3
+
+_lock = threading.Lock()
+_store = None   # {source: {"fingerprint": str, "items": {item_fp: enriched_deal}}}
+_seen = {}      # {source: {item_fp: enriched_deal}} for this run
+_stats = {"reused": 0, "enriched": 0}
+_enrichment_version = str(STAGE_VERSION)
+
+
+def fingerprint(payload):
+    """
+    Stable hash of a JSON-like payload (key order and surrounding whitespace don't matter).
+    """
+    def normalize(value):
+        if isinstance(value, str):
+            return " ".join(value.split())
+        if isinstance(value, dict):
+            return {str(k): normalize(v) for k, v in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [normalize(v) for v in value]
+        return value
+    encoded = json.dumps(normalize(payload), sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+def fingerprint_deal(deal):
+    """
+    Fingerprint of a raw (not yet enriched) deal. The id is left out because several
+    scrapers number their deals by position, which shifts whenever a listing is added upstream.
+    """
+    return fingerprint([_enrichment_version, {k: v for k, v in deal.items() if k != 'id'}])
+
+
+def configure(*component_versions):
+    """
+    Set the enrichment version mixed into deal fingerprints: STAGE_VERSION plus the versions of the
+    stages' own rules (ai_parser.PARSER_VERSION, pdf_analyzer.RISK_VERSION). Stored deals enriched
+    under another version no longer match and go through the stages again.
+    """
+    global _enrichment_version
+    with _lock:
+        _enrichment_version = "|".join(str(v) for v in (STAGE_VERSION,) + component_versions)
+
+
+def load():
+    """
+    Load the stored fingerprints and start a new run.
+    """
+    global _store, _seen
+    with _lock:
+        _store = {}
+        _seen = {}
+        _stats.update(reused=0, enriched=0)
+        if os.path.exists(FINGERPRINTS_FILEPATH):
+            try:
+                with open(FINGERPRINTS_FILEPATH, 'r', encoding='utf-8') as f:
+                    _store = json.load(f)
+            except Exception as e:
+                logging.warning(f"Ignoring unreadable fingerprint store: {e}")
+                _store = {}
+
+
+def lookup(source, item_fp, is_current=None):
+    """
+    The enriched deal stored for this source/fingerprint, or None if it is new or changed, or if
+    is_current(stored deal) says what it was enriched from has changed since.
+    """
+    with _lock:
+        if _store is None:
+            return None
+        deal = _store.get(source, {}).get("items", {}).get(item_fp)
+        if deal is None or (is_current is not None and not is_current(deal)):
+            return None
+        _seen.setdefault(source, {})[item_fp] = deal
+        _stats["reused"] += 1
+        return copy.deepcopy(deal)
+
+
+def record(source, item_fp, deal):
+    """
+    Remember the enriched deal produced for a fingerprint in this run.
+    """
+    with _lock:
+        _seen.setdefault(source, {})[item_fp] = copy.deepcopy(deal)
+        _stats["enriched"] += 1
+
+
+def save():
+    """
+    Persist this run's fingerprints. Sources that produced nothing this run keep their old entries;
+    listings that disappeared from a source that did run are dropped.
+    """
+    with _lock:
+        if _store is None:
+            return
+        for source, items in _seen.items():
+            source_fp = fingerprint(sorted(items))
+            if _store.get(source, {}).get("fingerprint") == source_fp:
+                logging.info(f"Source '{source}' is unchanged since the last run")
+            _store[source] = {"fingerprint": source_fp, "items": items}
+        try:
+            os.makedirs(os.path.dirname(FINGERPRINTS_FILEPATH) or '.', exist_ok=True)
+            tmp_path = FINGERPRINTS_FILEPATH + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(_store, f, ensure_ascii=False)
+            os.replace(tmp_path, FINGERPRINTS_FILEPATH)
+        except OSError as e:
+            logging.warning(f"Failed to save fingerprints: {e}")
+
+
+def get_stats():
+    with _lock:
+        return dict(_stats)
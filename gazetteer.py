@@ -0,0 +1,182 @@
+import json
+import logging
+import os
+import threading
+from collections import namedtuple
+import hebrew_text
+
+# Offline locality lookup. localities.json lists Israeli cities and local councils with their aliases,
+# district and coordinates; names are indexed in a trie keyed by folded tokens (hebrew_text), so one
+# left-to-right pass over a text finds the longest locality name starting at each word, including
+# prefixed forms ("בחיפה") and any quote/hyphen spelling ("תל-אביב", ת״א).
+# Some names are also everyday words (אזור "area", שדרות "boulevard", מעלות "degrees"): in free text they
+# only count with a locative prefix ("בשדרות") and not as the head of a phrase ("באזור המרכז");
+# fields that hold a place (city, timeLeft) accept them bare.
+GAZETTEER_FILEPATH = os.getenv("GAZETTEER_FILEPATH",
+                               os.path.join(os.path.dirname(os.path.abspath(__file__)), 'localities.json'))
+# Spelling variants generated for every name, so the file only needs one of them
+SPELLING_VARIANTS = {"קריית": "קרית", "תקווה": "תקוה"}
+# Deal fields that name a place, most specific first (most scrapers keep the location in timeLeft)
+LOCATION_FIELDS = ("city", "timeLeft", "title")
+# Names (or aliases) that are common words, the prefix letter that marks them as a place in free text,
+# and the article that, on the next word, makes them a common noun again
+AMBIGUOUS_NAMES = {"אזור", "שדרות", "מעלות", "מודיעין", "יבנה"}
+LOCATIVE_PREFIX = "ב"
+DEFINITE_ARTICLE = "ה"
+# Deal types whose titles describe an item, not where it is: their locality comes from the location fields only
+NO_TITLE_LOCATION_TYPES = {"car", "equipment"}
+
+Locality = namedtuple("Locality", "name district lat lon")
+
+_lock = threading.Lock()
+_trie = None
+_starts = frozenset()   # first name tokens with up to MAX_PREFIXES prefix letters in front
+_END = ""
+
+
+def _variants(name):
+    names = {name}
+    for spelling, variant in SPELLING_VARIANTS.items():
+        names |= {n.replace(spelling, variant) for n in names}
+    return names
+
+
+def load(path=None):
+    """
+    Read the gazetteer file into a list of (Locality, [names and aliases]).
+    """
+    with open(path or GAZETTEER_FILEPATH, 'r', encoding='utf-8') as f:
+        entries = json.load(f)
+    return [(Locality(e["name"], e.get("district"), e.get("lat"), e.get("lon")), [e["name"]] + e.get("aliases", []))
+            for e in entries]
+
+
+def build_trie(entries):
+    """
+    Nested dicts keyed by folded name tokens; the _END key holds (Locality, needs context) for the name
+    a path spells.
+    """
+    trie = {}
+    for locality, names in entries:
+        for name in names:
+            for variant in _variants(name):
+                words = hebrew_text.phrase_tokens(variant)
+                if not words:
+                    continue
+                node = trie
+                for word in words:
+                    node = node.setdefault(word, {})
+                needs_context = name in AMBIGUOUS_NAMES
+                if _END not in node or (node[_END][1] and not needs_context):
+                    node[_END] = (locality, needs_context)
+    return trie
+
+
+def prefixed_starts(trie):
+    """
+    Every first name token of the trie with up to MAX_PREFIXES prefix letters in front of it. A word
+    outside this set can't start a locality name, so match_spans doesn't try its forms.
+    """
+    return frozenset().union(*(hebrew_text.prefixed(key) for key in trie if key != _END))
+
+
+def get_trie():
+    global _trie, _starts
+    if _trie is None:
+        with _lock:
+            if _trie is None:
+                try:
+                    trie = build_trie(load())
+                except Exception as e:
+                    logging.error(f"Failed to load gazetteer from {GAZETTEER_FILEPATH}: {e}")
+                    trie = {}
+                _starts = prefixed_starts(trie)
+                _trie = trie
+    return _trie
+
+
+def find_localities(text, bare=False):
+    """
+    Every locality named in text, in order of appearance, longest name winning at each position.
+    bare=True accepts ambiguous names without a locative prefix (for text known to be a place).
+    """
+    return find_localities_in_words(hebrew_text.tokenize_title(text).words, bare)
+
+
+def find_localities_in_words(words, bare=False):
+    """
+    find_localities() over the words of an already tokenized text (hebrew_text.tokenize_title()).
+    """
+    return [locality for _, _, locality in match_spans(words, bare)]
+
+
+def match_spans(words, bare=False):
+    """
+    (first, end, Locality) for every locality in a list of folded words (punctuation already dropped).
+    """
+    trie = get_trie()
+    spans = []
+    end = 0
+    # Only words that can start a name are tried
+    for i in hebrew_text.positions(words, _starts):
+        if i < end:
+            continue
+        best, best_end = None, i
+        # The first word may carry prefix letters (the forms() variants, walked in place since this runs
+        # for every title); the following words must match exactly
+        word = form = words[i]
+        for stripped in range(hebrew_text.MAX_PREFIXES + 1):
+            node, j = trie.get(form), i + 1
+            while node is not None:
+                if _END in node and j > best_end:
+                    locality, needs_context = node[_END]
+                    if bare or not needs_context or _in_context(word[:stripped], words, j):
+                        best, best_end = locality, j
+                if j >= len(words):
+                    break
+                node, j = node.get(words[j]), j + 1
+            if len(form) - 1 < hebrew_text.MIN_STEM or form[0] not in hebrew_text.PREFIX_LETTERS:
+                break
+            form = form[1:]
+        if best is not None:
+            spans.append((i, best_end, best))
+            end = best_end
+    return spans
+
+
+def _in_context(prefix, words, end):
+    """
+    Whether an ambiguous name ending before words[end] reads as a place: it carries the locative
+    prefix and the next word isn't a definite noun it governs.
+    """
+    return LOCATIVE_PREFIX in prefix and not (end < len(words) and words[end].startswith(DEFINITE_ARTICLE))
+
+
+def find_locality(text, bare=False):
+    found = find_localities(text, bare)
+    return found[0] if found else None
+
+
+def locate_deal(deal, fields=LOCATION_FIELDS, title_tokens=None):
+    """
+    Fill city, district, lat and lon from the first location field that names a known locality
+    (the title only for deal types whose titles can say where the deal is). `title_tokens` is the title's
+    hebrew_text.tokenize_title(), if the caller already has it.
+    Deals without a recognizable place are left as they are.
+    """
+    for field in fields:
+        if field == "title" and deal.get("type") in NO_TITLE_LOCATION_TYPES:
+            continue
+        value = deal.get(field)
+        if field == "title" and title_tokens is not None:
+            localities = find_localities_in_words(title_tokens.words)
+            locality = localities[0] if localities else None
+        else:
+            locality = find_locality(value, bare=field != "title") if isinstance(value, str) else None
+        if locality is not None:
+            deal["city"] = locality.name
+            deal["district"] = locality.district
+            deal["lat"] = locality.lat
+            deal["lon"] = locality.lon
+            break
+    return deal
@@ -0,0 +1,286 @@
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import requests
+from requests.adapters import HTTPAdapter
+import browser
+import http_cache
+import page_wait
+
+# gov.il JSON endpoints used by the scrapers
+COLLECTORS_API = "https://www.gov.il/CollectorsWebApi/api/DataCollector/GetResults"
+PUBLICATION_API = "https://www.gov.il/he/api/PublicationApi/Index"
+GOVIL_ORIGIN = "https://www.gov.il"
+
+HTTP_TIMEOUT = 15
+HTTP_POOL_SIZE = 16
+# Page size requested from the paginated endpoints, and how many pages are fetched ahead of the consumer
+GOVIL_PAGE_SIZE = 50
+GOVIL_PREFETCH_PAGES = 2
+# Statuses that mean the WAF refused a non-browser client rather than a real API error
+BLOCKED_STATUSES = {401, 403, 429, 503}
+
+_session = None
+_session_lock = threading.Lock()
+
+
+class BlockedError(Exception):
+    """
+    Raised when gov.il answers a direct HTTP call with a block page instead of JSON.
+    """
+
+
+def get_session():
+    """
+    Shared pooled requests.Session for all gov.il API calls (keep-alive across sources and threads).
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_SIZE, max_retries=1)
+            session.mount("https://", adapter)
+            session.headers.update({
+                "User-Agent": browser.USER_AGENT,
+                "Accept": "application/json",
+                "Referer": "https://www.gov.il/",
+            })
+            _session = session
+    return _session
+
+
+def _is_json(response):
+    return "json" in (response.headers.get("Content-Type") or "").lower()
+
+
+def fetch_json_direct(api_url):
+    """
+    Call a gov.il JSON endpoint over plain HTTP. Raises BlockedError if the call is refused.
+    Goes through the on-disk response cache, so unchanged results come back as cache hits or 304s;
+    only JSON responses are cached, so a challenge page isn't replayed for the whole TTL.
+    """
+    response = http_cache.cached_get(api_url, get_session(), source="govil_api", validate=_is_json,
+                                     timeout=HTTP_TIMEOUT)
+    if response.status_code in BLOCKED_STATUSES:
+        raise BlockedError(f"HTTP {response.status_code}")
+    response.raise_for_status()
+    try:
+        return response.json()
+    except ValueError:
+        # An HTML challenge page with status 200
+        raise BlockedError(f"non-JSON response ({response.headers.get('Content-Type', 'unknown')})")
+
+
+def _ensure_on_govil(driver, landing_url=None, ready=None):
+    """
+    Make sure the browser is on a gov.il document so in-page fetch() is same-origin.
+    """
+    current_url = ""
+    try:
+        current_url = driver.current_url or ""
+    except Exception:
+        pass
+    if not current_url.startswith(GOVIL_ORIGIN):
+        browser.apply_block_profile(driver)
+        driver.get(landing_url or GOVIL_ORIGIN)
+        page_wait.wait_until_ready(driver, ready, "gov.il landing page")
+
+
+def fetch_json_in_browser(driver, api_url, landing_url=None, ready=None):
+    """
+    Run fetch() for api_url inside the browser so it carries gov.il's cookies and fingerprint.
+    Navigates to landing_url first if the driver is not already on a gov.il page.
+    """
+    _ensure_on_govil(driver, landing_url, ready)
+    js = f"var cb=arguments[0];fetch('{api_url}').then(r=>r.json()).then(d=>cb(d)).catch(e=>cb({{error:e.message}}));"
+    return driver.execute_async_script(js)
+
+
+def fetch_json(api_url, driver=None, landing_url=None, ready=None):
+    """
+    Fetch a gov.il JSON endpoint, direct HTTP first and the browser only as a fallback.
+    Returns the decoded JSON, or None when both paths fail.
+    """
+    try:
+        return fetch_json_direct(api_url)
+    except (BlockedError, requests.RequestException) as e:
+        if driver is None:
+            logging.warning(f"Direct gov.il API call failed ({e}) and no browser fallback is available")
+            return None
+        logging.info(f"Direct gov.il API call failed ({e}), falling back to the browser")
+    try:
+        return fetch_json_in_browser(driver, api_url, landing_url, ready)
+    except Exception as e:
+        logging.warning(f"Browser fallback for {api_url} failed: {e}")
+        return None
+
+
+def fetch_json_many_in_browser(driver, api_urls, landing_url=None, ready=None):
+    """
+    Run all fetches in one Promise.all inside the page: one WebDriver round trip for any number of URLs.
+    Returns results in the same order as api_urls.
+    """
+    _ensure_on_govil(driver, landing_url, ready)
+    js = (
+        "var urls=arguments[0], cb=arguments[arguments.length-1];"
+        "Promise.all(urls.map(u=>fetch(u).then(r=>r.json()).catch(e=>({error:e.message})))).then(cb);"
+    )
+    return driver.execute_async_script(js, list(api_urls))
+
+
+def fetch_json_many(api_urls, driver=None, landing_url=None, ready=None, max_workers=HTTP_POOL_SIZE):
+    """
+    Fetch several gov.il JSON endpoints concurrently.
+    Yields (api_url, result) as each response arrives; URLs the direct path could not serve are
+    retried together in a single in-browser Promise.all when a driver is available.
+    """
+    api_urls = list(api_urls)
+    failed = []
+    if api_urls:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(api_urls))) as pool:
+            futures = {pool.submit(fetch_json_direct, api_url): api_url for api_url in api_urls}
+            for future in as_completed(futures):
+                api_url = futures[future]
+                try:
+                    yield api_url, future.result()
+                except (BlockedError, requests.RequestException) as e:
+                    logging.info(f"Direct gov.il API call failed ({e}) for {api_url}")
+                    failed.append(api_url)
+
+    if not failed:
+        return
+    if driver is None:
+        logging.warning(f"{len(failed)} gov.il API calls failed and no browser fallback is available")
+        return
+    logging.info(f"Falling back to the browser for {len(failed)} gov.il API calls")
+    try:
+        results = fetch_json_many_in_browser(driver, failed, landing_url, ready) or []
+    except Exception as e:
+        logging.warning(f"Browser fallback for {len(failed)} gov.il API calls failed: {e}")
+        return
+    for api_url, result in zip(failed, results):
+        yield api_url, result
+
+
+def extract_items(result):
+    """
+    Pull the result list out of a CollectorsWebApi/PublicationApi response.
+    """
+    if isinstance(result, dict):
+        return result.get('results', result.get('Results', [])) or []
+    if isinstance(result, list):
+        return result
+    return []
+
+
+def extract_total(result):
+    """
+    Total result count reported by a paginated response, or None if it doesn't say.
+    """
+    if isinstance(result, dict):
+        for key in ("total", "Total", "TotalResults", "totalResults"):
+            if isinstance(result.get(key), int):
+                return result[key]
+    return None
+
+
+def paged_url(api_url, skip, limit=GOVIL_PAGE_SIZE, skip_param="skip", limit_param="limit"):
+    """
+    Append skip/limit paging parameters to an API URL.
+    """
+    separator = "&" if "?" in api_url else "?"
+    return f"{api_url}{separator}{skip_param}={skip}&{limit_param}={limit}"
+
+
+def _fetch_page_direct(page_url):
+    """
+    Prefetch worker: never raises, never touches the (single-threaded) browser.
+    """
+    try:
+        return True, fetch_json_direct(page_url)
+    except (BlockedError, requests.RequestException) as e:
+        return False, e
+
+
+def iter_results(api_url, driver=None, landing_url=None, ready=None, skip=0, first_result=None,
+                 page_size=GOVIL_PAGE_SIZE, prefetch=GOVIL_PREFETCH_PAGES,
+                 skip_param="skip", limit_param="limit", max_pages=None):
+    """
+    Lazily yield every item of a paginated gov.il endpoint.
+
+    Pages are requested with skip/limit and advance by the number of rows the server actually returns
+    (endpoints cap `limit` at their own page size). The reported total decides when to stop; an endpoint
+    that reports no total ends at the first page shorter than the first one, or an empty page.
+    At most `prefetch` pages are in flight ahead of the consumer, so memory stays bounded by the window
+    rather than the result set, and max_pages (if given) caps how many pages are read in all.
+    If the caller already holds the page at `skip` it can pass it as first_result.
+    Pages the direct path cannot serve are fetched through the browser on the consumer's thread.
+    """
+    def fetch_in_consumer(page_url):
+        return fetch_json(page_url, driver, landing_url, ready)
+
+    if first_result is None:
+        first_result = fetch_in_consumer(paged_url(api_url, skip, page_size, skip_param, limit_param))
+    total = extract_total(first_result)
+    items = extract_items(first_result)
+    yield from items
+    # The server's real page size; a first page shorter than `limit` may just be its cap
+    step = len(items)
+    next_skip = skip + step
+    pages_left = None if max_pages is None else max_pages - 1
+    if not items or (total is not None and next_skip >= total):
+        return
+
+    with ThreadPoolExecutor(max_workers=max(1, prefetch)) as pool:
+        window = deque()
+
+        def fill_window():
+            nonlocal next_skip, pages_left
+            while len(window) < max(1, prefetch) and (total is None or next_skip < total) and pages_left != 0:
+                page_url = paged_url(api_url, next_skip, page_size, skip_param, limit_param)
+                window.append((next_skip, page_url, pool.submit(_fetch_page_direct, page_url)))
+                next_skip += step
+                if pages_left is not None:
+                    pages_left -= 1
+                if total is None:
+                    # Without a total we can't know where the end is; don't run ahead blindly
+                    break
+
+        fill_window()
+        while window:
+            page_skip, page_url, future = window.popleft()
+            ok, result = future.result()
+            if not ok:
+                logging.info(f"Direct page fetch failed ({result}), retrying {page_url} via fallback")
+                result = fetch_in_consumer(page_url)
+            page_items = extract_items(result)
+            if not page_items:
+                break
+            yield from page_items
+            if len(page_items) < step:
+                if total is None:
+                    break
+                # A short page before the end: the prefetched offsets are off, restart right after it
+                for _, _, pending in window:
+                    if pending.cancel() and pages_left is not None:
+                        pages_left += 1
+                window.clear()
+                next_skip = page_skip + len(page_items)
+            fill_window()
+        if pages_left == 0 and (total is None or next_skip < total):
+            logging.info(f"Stopped paging {api_url} after {max_pages} pages")
+
+
+def iter_collector_results(api_url, driver=None, landing_url=None, ready=None, **kwargs):
+    """
+    Paginate a CollectorsWebApi GetResults query (lowercase skip/limit).
+    """
+    return iter_results(api_url, driver, landing_url, ready, skip_param="skip", limit_param="limit", **kwargs)
+
+
+def iter_publication_results(api_url, driver=None, landing_url=None, ready=None, **kwargs):
+    """
+    Paginate a PublicationApi/Index query (Skip/Limit).
+    """
+    return iter_results(api_url, driver, landing_url, ready, skip_param="Skip", limit_param="Limit", **kwargs)
@@ -0,0 +1,256 @@
+import re
+from collections import namedtuple
+from itertools import chain
+from operator import itemgetter
+
+# Shared Hebrew normalization and tokenization. Text is normalized with a single str.translate pass
+# and tokenized with a single regex pass; extractors (ai_parser, pdf_analyzer, keyword_engine) work on
+# the resulting tokens instead of rescanning the raw string with their own spelling variants.
+#
+# Two parallel strings of the same length come out of normalization, so token offsets are shared:
+#   clean  - niqqud/cantillation removed, quote and geresh variants unified (for display, e.g. a model name)
+#   folded - clean plus final letters folded to their regular form and lowercased (for matching)
+# Titles go through tokenize_title() instead: ai_parser tokenizes each title once and hands the same
+# TitleTokens to its field parsers, the gazetteer and the title model.
+
+# Gershayim and typographic double quotes -> ", geresh and typographic single quotes -> '
+QUOTES = {
+    "״": '"', "“": '"', "”": '"', "„": '"', "″": '"',
+    "׳": "'", "‘": "'", "’": "'", "‚": "'", "`": "'", "´": "'", "′": "'",
+}
+FINAL_LETTERS = {"ך": "כ", "ם": "מ", "ן": "נ", "ף": "פ", "ץ": "צ"}
+MAQAF = "־"
+# Points and cantillation marks (U+0591-U+05C7), except the punctuation that lives in that block
+NIQQUD = [chr(c) for c in range(0x0591, 0x05C8) if chr(c) not in (MAQAF, "׀", "׃", "׆")]
+# Letters that attach to the front of a word: be-, le-, ha-, ve-
+PREFIX_LETTERS = "בלהו"
+MAX_PREFIXES = 3
+MIN_STEM = 2
+
+_CLEAN_TABLE = {ord(k): v for k, v in QUOTES.items()}
+_CLEAN_TABLE.update({ord(c): None for c in NIQQUD})
+_CLEAN_TABLE[ord(MAQAF)] = "-"
+# Most titles contain none of these, so clean() can return them untouched
+_CLEAN_RE = re.compile("''|[" + re.escape("".join(chr(c) for c in _CLEAN_TABLE)) + "]")
+_ASCII_LOWER = {c: c + 32 for c in range(ord("A"), ord("Z") + 1)}
+_THOUSANDS_RE = re.compile(r"\d{1,3}(,\d{3})+")
+
+# Numbers keep their separators ("3.5", "1,200"); words keep inner quotes/geresh (מ"ר, ת"א, פיג'ו)
+# and a trailing geresh (חד'). Anything else that isn't whitespace is a one-character punct token.
+LETTER = "A-Za-zא-ת"
+NUMBER = r"\d+(?:[.,]\d+)*"
+WORD = rf"[{LETTER}][{LETTER}\d]*(?:[\"'][{LETTER}]+)*'?"
+TOKEN_RE = re.compile(rf"({NUMBER})|({WORD})|(\S)")
+KINDS = {1: "number", 2: "word", 3: "punct"}
+_NORM_RE = re.compile(rf"{NUMBER}|{WORD}|\S")
+_WORD_START = frozenset("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyzאבגדהוזחטיכךלמםנןסעפףצץקרשת")
+# Titles and other short fields (a city, the place in timeLeft) repeat the same words from deal to deal, so
+# tokenize_title() analyzes each whitespace-separated chunk once and remembers it; a title is then split
+# and looked up chunk by chunk. TOKEN_RE never matches across whitespace, so these are the tokens
+# tokenize() finds. The memo is emptied when it reaches CHUNK_MEMO_SIZE chunks.
+CHUNK_MEMO_SIZE = 100000
+
+Token = namedtuple("Token", "text norm kind start end")
+Analysis = namedtuple("Analysis", "clean folded tokens")
+# A title token has no offsets; `spaced` is whether it starts a whitespace-separated chunk
+TitleToken = namedtuple("TitleToken", "text norm kind spaced")
+
+_chunks = {}   # {chunk: (tokens, norms, words, folded) of the chunk}
+_TOKENS, _NORMS, _WORDS, _FOLDED = (itemgetter(i) for i in range(4))
+
+
+def clean(text):
+    """
+    Text without niqqud, with quote/geresh variants unified (two single quotes become one double quote).
+    Same length as what fold() returns.
+    """
+    text = text or ""
+    if not _CLEAN_RE.search(text):
+        return text
+    return text.replace("''", '"').translate(_CLEAN_TABLE)
+
+
+def _fold_clean(cleaned):
+    folded = cleaned.lower()
+    if len(folded) != len(cleaned):
+        # A few non-Latin capitals grow when lowercased; keep offsets aligned with the clean text
+        folded = cleaned.translate(_ASCII_LOWER)
+    for final, regular in FINAL_LETTERS.items():
+        if final in folded:
+            folded = folded.replace(final, regular)
+    return folded
+
+
+def fold(text):
+    """
+    Matching form of text: clean() plus final letters folded and lowercased.
+    """
+    return _fold_clean(clean(text))
+
+
+def analyze(text):
+    """
+    Normalize and tokenize text once. Tokens carry the clean surface text, the folded form,
+    a kind ("number", "word" or "punct") and offsets into both strings.
+    """
+    cleaned = clean(text)
+    folded = _fold_clean(cleaned)
+    # tuple.__new__ skips namedtuple's Python-level constructor; this loop runs for every token of every title
+    new = tuple.__new__
+    tokens = [new(Token, (cleaned[m.start():m.end()], m.group(), KINDS[m.lastindex], m.start(), m.end()))
+              for m in TOKEN_RE.finditer(folded)]
+    return Analysis(cleaned, folded, tokens)
+
+
+def tokenize(text):
+    return analyze(text).tokens
+
+
+def _analyze_chunk(chunk):
+    cleaned = clean(chunk)
+    folded = _fold_clean(cleaned)
+    # A chunk has no whitespace, so its tokens tile it: each starts where the previous one ended
+    norms = _NORM_RE.findall(folded)
+    new = tuple.__new__
+    tokens = []
+    start = 0
+    for norm in norms:
+        end = start + len(norm)
+        kind = "number" if norm[0].isdecimal() else "word" if norm[0] in _WORD_START else "punct"
+        tokens.append(new(TitleToken, (cleaned[start:end], norm, kind, not start)))
+        start = end
+    entry = (tokens, norms, [t.norm for t in tokens if t.kind != "punct"], folded)
+    if len(_chunks) >= CHUNK_MEMO_SIZE:
+        _chunks.clear()
+    _chunks[chunk] = entry
+    return entry
+
+
+class TitleTokens:
+    """
+    A title tokenized once for every extractor that reads it. Each view is built from the chunk memo on
+    first use, so a parser that only needs the norms never pays for the rest:
+      norms  - folded norm of every token
+      tokens - every TitleToken (clean text, norm, kind, spaced)
+      words  - norms of the number and word tokens
+      folded - the folded text, chunks joined by single spaces (for keyword_engine)
+    """
+    __slots__ = ("_entries", "_norms", "_tokens", "_words", "_folded")
+
+    def __init__(self, entries):
+        self._entries = entries
+        self._norms = self._tokens = self._words = self._folded = None
+
+    @property
+    def norms(self):
+        if self._norms is None:
+            self._norms = list(chain.from_iterable(map(_NORMS, self._entries)))
+        return self._norms
+
+    @property
+    def tokens(self):
+        if self._tokens is None:
+            self._tokens = list(chain.from_iterable(map(_TOKENS, self._entries)))
+        return self._tokens
+
+    @property
+    def words(self):
+        if self._words is None:
+            self._words = list(chain.from_iterable(map(_WORDS, self._entries)))
+        return self._words
+
+    @property
+    def folded(self):
+        if self._folded is None:
+            self._folded = " ".join(map(_FOLDED, self._entries))
+        return self._folded
+
+
+def tokenize_title(text):
+    """
+    TitleTokens of a short text (a title, a city, a place name).
+    """
+    chunks = (text or "").split()
+    entries = list(map(_chunks.get, chunks))
+    if None in entries:
+        entries = [entry or _analyze_chunk(chunk) for entry, chunk in zip(entries, chunks)]
+    return TitleTokens(entries)
+
+
+def positions(norms, vocabulary):
+    """
+    Indices of the norms that are in `vocabulary` (a set), in order. Only the title's own norms are
+    looked up, and a title without any of the words costs a single pass in C.
+    """
+    found = []
+    for norm in vocabulary.intersection(norms):
+        i = -1
+        for _ in range(norms.count(norm)):
+            i = norms.index(norm, i + 1)
+            found.append(i)
+    found.sort()
+    return found
+
+
+def surface(tokens):
+    """
+    Clean text of a run of title tokens, with a single space wherever whitespace separated them.
+    """
+    return "".join(" " + t.text if t.spaced else t.text for t in tokens).lstrip(" ")
+
+
+def forms(token):
+    """
+    The folded word plus every variant with up to MAX_PREFIXES prefix letters removed
+    (ובדירה -> ובדירה, בדירה, דירה), longest first.
+    """
+    word = token if isinstance(token, str) else token.norm
+    variants = [word]
+    for _ in range(MAX_PREFIXES):
+        if len(word) - 1 < MIN_STEM or word[0] not in PREFIX_LETTERS:
+            break
+        word = word[1:]
+        variants.append(word)
+    return variants
+
+
+def prefixed(word):
+    """
+    The folded word with up to MAX_PREFIXES prefix letters in front of it: every token whose forms()
+    include the word.
+    """
+    variants = level = {word}
+    if len(word) >= MIN_STEM:
+        for _ in range(MAX_PREFIXES):
+            level = {letter + w for letter in PREFIX_LETTERS for w in level}
+            variants = variants | level
+    return variants
+
+
+def folded_set(words):
+    """
+    Fold a list of vocabulary words (units, keywords) the same way tokens are folded.
+    """
+    return {fold(word) for word in words}
+
+
+def number_value(token):
+    """
+    Numeric value of a number token: "3.5"/"3,5" are decimals, "1,200" has a thousands separator.
+    """
+    text = token if isinstance(token, str) else token.norm
+    if text.isdigit():
+        return float(text)
+    if _THOUSANDS_RE.fullmatch(text):
+        return float(text.replace(",", ""))
+    try:
+        return float(text.replace(",", "."))
+    except ValueError:
+        return None
+
+
+def phrase_tokens(phrase):
+    """
+    Folded word/number norms of a phrase, for matching against a token stream.
+    """
+    return tuple(tokenize_title(phrase).words)
@@ -0,0 +1,91 @@
+import logging
+from bs4 import BeautifulSoup, SoupStrainer
+
+# Fast HTML parsing shared by the DOM-based scrapers.
+# With lxml installed pages are tokenized by libxml2 directly (C) and extractors read scoped XPath results;
+# without it we fall back to BeautifulSoup's html.parser, restricted with SoupStrainer when the caller
+# names the subtrees it needs.
+try:
+    import lxml.html
+    HAVE_LXML = True
+except ImportError:
+    HAVE_LXML = False
+
+# Visible text only: elements whose text is never listing content are skipped
+TEXT_XPATH = "//body//text()[not(ancestor::script or ancestor::style or ancestor::noscript or ancestor::template or ancestor::svg)]"
+
+
+class ParsedPage:
+    """
+    A page tokenized once; every extractor reads from the same tree and caches its result.
+    `only` restricts parsing to the listed tag names (e.g. ["tr"]) when the caller knows
+    which subtrees it needs.
+    """
+
+    def __init__(self, html, only=None, backend=None):
+        self.backend = backend or ("lxml" if HAVE_LXML else "html.parser")
+        self.only = list(only) if only else None
+        self._text_blocks = None
+        self._rows = None
+        if self.backend == "lxml":
+            self.tree = lxml.html.fromstring(html) if html and html.strip() else None
+        else:
+            strainer = SoupStrainer(self.only) if self.only else None
+            self.tree = BeautifulSoup(html, "html.parser", parse_only=strainer)
+
+    def text_blocks(self, min_len=0):
+        """
+        Stripped, non-empty visible text nodes in document order
+        (what soup.get_text(separator='|', strip=True).split('|') used to produce).
+        """
+        if self._text_blocks is None:
+            if self.tree is None:
+                self._text_blocks = []
+            elif self.backend == "lxml":
+                xpath = TEXT_XPATH if not self.only else "|".join(
+                    f"//{tag}//text()" for tag in self.only)
+                self._text_blocks = [t.strip() for t in self.tree.xpath(xpath) if t.strip()]
+            else:
+                # stripped_strings already skips <script>/<style> contents
+                self._text_blocks = list(self.tree.stripped_strings)
+        if min_len:
+            return [t for t in self._text_blocks if len(t) > min_len]
+        return self._text_blocks
+
+    def table_rows(self, min_cols=1):
+        """
+        Cell texts of every <tr> that has at least min_cols <td> cells.
+        """
+        if self._rows is None:
+            if self.tree is None:
+                self._rows = []
+            elif self.backend == "lxml":
+                self._rows = [[cell.text_content().strip() for cell in row.iter("td")]
+                              for row in self.tree.iter("tr")]
+            else:
+                self._rows = [[cell.get_text(strip=True) for cell in row.find_all("td")]
+                              for row in self.tree.find_all("tr")]
+        return [cells for cells in self._rows if len(cells) >= min_cols]
+
+    def links(self):
+        """
+        (href, anchor text) of every <a> with an href, in document order.
+        """
+        if self.tree is None:
+            return []
+        if self.backend == "lxml":
+            return [(a.get("href"), a.text_content().strip()) for a in self.tree.iter("a") if a.get("href")]
+        return [(a["href"], a.get_text(strip=True)) for a in self.tree.find_all("a", href=True)]
+
+
+def parse_page(html, only=None):
+    """
+    Tokenize a page once. If lxml rejects the input, html.parser gets a second try.
+    """
+    try:
+        return ParsedPage(html, only)
+    except Exception as e:
+        if not HAVE_LXML:
+            raise
+        logging.warning(f"lxml failed to parse page ({e}), retrying with html.parser")
+        return ParsedPage(html, only, backend="html.parser")
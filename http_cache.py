@@ -0,0 +1,290 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import requests
+from urllib.parse import urlencode, urlsplit, urlunsplit, parse_qsl
+
+# Persistent on-disk cache for HTTP GET responses (gov.il API JSON, tender PDFs).
+# Entries keep their ETag/Last-Modified validators, are served without a request while fresh,
+# revalidated with a conditional request once stale, and evicted least-recently-used past the size cap.
+CACHE_DIR = os.environ.get('HTTP_CACHE_DIR', os.path.join('.cache', 'http'))
+INDEX_FILENAME = 'index.json'
+MAX_CACHE_BYTES = int(os.environ.get('HTTP_CACHE_MAX_BYTES', str(200 * 1024 * 1024)))
+
+# Seconds an entry is served without touching the network, per source.
+# 0 means "always revalidate" (a 304 still skips the download).
+DEFAULT_TTL = 0
+TTLS = {
+    "govil_api": 30 * 60,
+    "pdf": 7 * 24 * 3600,
+    "deal_page": 24 * 3600,
+}
+
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+_lock = threading.RLock()
+_index = None
+_stats = {"hits": 0, "revalidated": 0, "misses": 0}
+
+
+class BodyTooLarge(Exception):
+    """
+    A streamed download exceeded the caller's size cap.
+    """
+
+
+def cache_key(url, params=None):
+    """
+    Stable key for a URL plus query, independent of query parameter order.
+    """
+    parts = urlsplit(url)
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    if params:
+        query.extend((str(k), str(v)) for k, v in (params.items() if isinstance(params, dict) else params))
+    normalized = urlunsplit((parts.scheme, parts.netloc.lower(), parts.path, urlencode(sorted(query)), ''))
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+
+def _index_path():
+    return os.path.join(CACHE_DIR, INDEX_FILENAME)
+
+
+def _body_path(key):
+    return os.path.join(CACHE_DIR, f"{key}.body")
+
+
+def _load_index():
+    global _index
+    if _index is None:
+        _index = {}
+        if os.path.exists(_index_path()):
+            try:
+                with open(_index_path(), 'r', encoding='utf-8') as f:
+                    _index = json.load(f)
+            except Exception as e:
+                logging.warning(f"Ignoring unreadable HTTP cache index: {e}")
+                _index = {}
+    return _index
+
+
+def _save_index():
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp_path = _index_path() + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(_index, f)
+    os.replace(tmp_path, _index_path())
+
+
+def _evict():
+    """
+    Drop least-recently-used entries until the cache fits MAX_CACHE_BYTES.
+    """
+    total = sum(entry.get('size', 0) for entry in _index.values())
+    if total <= MAX_CACHE_BYTES:
+        return
+    for key, entry in sorted(_index.items(), key=lambda kv: kv[1].get('last_access', 0)):
+        if total <= MAX_CACHE_BYTES:
+            break
+        try:
+            os.remove(_body_path(key))
+        except OSError:
+            pass
+        total -= entry.get('size', 0)
+        del _index[key]
+
+
+def _read_body(key):
+    try:
+        with open(_body_path(key), 'rb') as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def _store(key, url, response, body_path=None, size=None):
+    """
+    Index a 200 response. The body is either response.content or a file already written at body_path.
+    """
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    if body_path is None:
+        tmp_path = _body_path(key) + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(response.content)
+        body_path, size = tmp_path, len(response.content)
+    os.replace(body_path, _body_path(key))
+    now = time.time()
+    _index[key] = {
+        'url': url,
+        'etag': response.headers.get('ETag'),
+        'last_modified': response.headers.get('Last-Modified'),
+        'content_type': response.headers.get('Content-Type'),
+        'stored_at': now,
+        'last_access': now,
+        'size': size,
+    }
+    _evict()
+    _save_index()
+
+
+def _cached_response(url, entry, body):
+    response = requests.models.Response()
+    response.status_code = 200
+    response.url = url
+    response._content = body
+    for header, field in (('Content-Type', 'content_type'), ('ETag', 'etag'), ('Last-Modified', 'last_modified')):
+        if entry.get(field):
+            response.headers[header] = entry[field]
+    response.from_cache = True
+    return response
+
+
+def cached_get(url, session=None, params=None, source=None, ttl=None, validate=None, **kwargs):
+    """
+    GET through the on-disk cache. Returns a requests.Response; cache hits and 304 revalidations
+    come back as status 200 with the stored body and response.from_cache set to True.
+    Only 200 responses are stored, and only those `validate(response)` accepts when it is given
+    (e.g. an HTML challenge page served with 200 where JSON was expected).
+    """
+    session = session or requests
+    ttl = TTLS.get(source, DEFAULT_TTL) if ttl is None else ttl
+    key = cache_key(url, params)
+    headers = dict(kwargs.pop('headers', None) or {})
+
+    with _lock:
+        entry = _load_index().get(key)
+        body = _read_body(key) if entry else None
+    if entry and body is not None:
+        if time.time() - entry.get('stored_at', 0) < ttl:
+            with _lock:
+                entry['last_access'] = time.time()
+                _stats['hits'] += 1
+            return _cached_response(url, entry, body)
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+
+    response = session.get(url, params=params, headers=headers, **kwargs)
+
+    with _lock:
+        if response.status_code == 304 and entry and body is not None:
+            entry['stored_at'] = entry['last_access'] = time.time()
+            _stats['revalidated'] += 1
+            _save_index()
+            return _cached_response(url, entry, body)
+        _stats['misses'] += 1
+        if response.status_code == 200 and (validate is None or validate(response)):
+            try:
+                _store(key, url, response)
+            except OSError as e:
+                logging.warning(f"Failed to write HTTP cache entry for {url}: {e}")
+    response.from_cache = False
+    return response
+
+
+def cached_download(url, fileobj, session=None, source=None, ttl=None, max_bytes=None, **kwargs):
+    """
+    Streaming variant of cached_get for large bodies (PDFs): the body is written to fileobj in chunks,
+    never held whole in memory, and also streamed into the cache. Raises BodyTooLarge (leaving fileobj
+    partly written) once more than max_bytes arrive or the announced Content-Length is over it.
+    Returns the response (without content) with from_cache set.
+    """
+    session = session or requests
+    ttl = TTLS.get(source, DEFAULT_TTL) if ttl is None else ttl
+    key = cache_key(url)
+    headers = dict(kwargs.pop('headers', None) or {})
+
+    with _lock:
+        entry = _load_index().get(key)
+        cached = entry is not None and os.path.exists(_body_path(key))
+    if cached and max_bytes is not None and entry.get('size', 0) > max_bytes:
+        raise BodyTooLarge(f"{url} is {entry.get('size')} bytes (cap {max_bytes})")
+    if cached:
+        fresh = time.time() - entry.get('stored_at', 0) < ttl
+        if not fresh:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+            response = session.get(url, headers=headers, stream=True, **kwargs)
+            if response.status_code != 304:
+                return _download_fresh(url, key, response, fileobj, max_bytes)
+            response.close()
+        try:
+            with open(_body_path(key), 'rb') as f:
+                shutil.copyfileobj(f, fileobj, DOWNLOAD_CHUNK_SIZE)
+        except OSError:
+            # Evicted in the meantime: fall back to a plain download
+            return _download_fresh(url, key, session.get(url, stream=True, **kwargs), fileobj, max_bytes)
+        with _lock:
+            entry['last_access'] = time.time()
+            if fresh:
+                _stats['hits'] += 1
+            else:
+                entry['stored_at'] = entry['last_access']
+                _stats['revalidated'] += 1
+                _save_index()
+        response = _cached_response(url, entry, b"")
+        return response
+
+    return _download_fresh(url, key, session.get(url, headers=headers, stream=True, **kwargs), fileobj, max_bytes)
+
+
+def _download_fresh(url, key, response, fileobj, max_bytes):
+    with _lock:
+        _stats['misses'] += 1
+    response.from_cache = False
+    try:
+        if response.status_code != 200:
+            return response
+        announced = response.headers.get('Content-Length')
+        if max_bytes is not None and announced and announced.isdigit() and int(announced) > max_bytes:
+            raise BodyTooLarge(f"{url} announces {announced} bytes (cap {max_bytes})")
+
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp_path = f"{_body_path(key)}.{threading.get_ident()}.tmp"
+        size = 0
+        try:
+            with open(tmp_path, 'wb') as cache_file:
+                for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                    size += len(chunk)
+                    if max_bytes is not None and size > max_bytes:
+                        raise BodyTooLarge(f"{url} exceeded {max_bytes} bytes")
+                    fileobj.write(chunk)
+                    cache_file.write(chunk)
+            with _lock:
+                try:
+                    _store(key, url, response, body_path=tmp_path, size=size)
+                except OSError as e:
+                    logging.warning(f"Failed to write HTTP cache entry for {url}: {e}")
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return response
+    finally:
+        response.close()
+
+
+def get_stats():
+    """
+    Hit/revalidation/miss counters for this process.
+    """
+    with _lock:
+        return dict(_stats)
+
+
+def flush():
+    """
+    Persist the index (access times of pure cache hits are only kept in memory until then).
+    """
+    with _lock:
+        if _index is not None:
+            try:
+                _save_index()
+            except OSError as e:
+                logging.warning(f"Failed to save HTTP cache index: {e}")
@@ -0,0 +1,236 @@
+import json
+import logging
+import os
+import threading
+from collections import deque
+import hebrew_text
+
+try:
+    import ahocorasick
+    HAVE_AHOCORASICK = True
+except ImportError:
+    HAVE_AHOCORASICK = False
+
+# Keyword classification (equipment categories/brands, car brands, deal-type words) runs
+# through one Aho-Corasick automaton built from taxonomy.json. A title is scanned once, whatever the
+# number of keywords, and every hit of every group comes back from that single pass.
+# Matching is by substring, like the `in` checks it replaces, on hebrew_text.fold()ed text: case, niqqud,
+# quote/geresh variants and final letters don't matter.
+# With pyahocorasick installed the automaton runs in C; otherwise the pure-Python one below is used.
+# Callers that already hold a title's hebrew_text.tokenize_title() tokens can match a group on whole
+# tokens instead (first_token_match): a term matches its own tokens, with prefix letters allowed on the first.
+# Short brand names (דל, HP, קיה) turn up inside unrelated words (מגדלור), so in WHOLE_WORD_GROUPS a term of
+# up to SHORT_TERM_LENGTH letters only matches a whole word, behind prefix letters (ודל) as hebrew_text.forms()
+# allows. The deal-type word groups keep substring matching: their short terms are stems (דיר, נכס, רכב).
+WHOLE_WORD_GROUPS = {"equipment_brand", "car_brand"}
+SHORT_TERM_LENGTH = 3
+TAXONOMY_FILEPATH = os.getenv("KEYWORD_TAXONOMY",
+                              os.path.join(os.path.dirname(os.path.abspath(__file__)), 'taxonomy.json'))
+
+_lock = threading.Lock()
+_matcher = None
+
+
+class KeywordMatcher:
+    """
+    Aho-Corasick automaton over (term, group, value) entries.
+    """
+
+    def __init__(self, entries, backend=None):
+        self.backend = backend or ("pyahocorasick" if HAVE_AHOCORASICK else "python")
+        # One term can belong to several groups (e.g. סמסונג is a brand and a phone category)
+        terms = {}
+        for term, group, value in entries:
+            term = hebrew_text.fold(term)
+            if term:
+                terms.setdefault(term, []).append((len(term), group, value))
+        self.size = sum(len(outputs) for outputs in terms.values())
+        # {group: {first token, with prefix letters: [(following tokens, value)], longest first}}
+        self.token_index = {}
+        for term, outputs in terms.items():
+            norms = hebrew_text.tokenize_title(term).norms
+            for _, group, value in outputs:
+                index = self.token_index.setdefault(group, {})
+                for form in hebrew_text.prefixed(norms[0]):
+                    index.setdefault(form, []).append((tuple(norms[1:]), value))
+        for index in self.token_index.values():
+            for matches in index.values():
+                matches.sort(key=lambda match: -len(match[0]))
+        self.token_starts = {group: frozenset(index) for group, index in self.token_index.items()}
+        if self.backend == "pyahocorasick":
+            self.automaton = ahocorasick.Automaton()
+            for term, outputs in terms.items():
+                self.automaton.add_word(term, outputs)
+            if terms:
+                self.automaton.make_automaton()
+        else:
+            self._build_tables(terms)
+
+    def _build_tables(self, terms):
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [[]]
+        for term, outputs in terms.items():
+            state = 0
+            for ch in term:
+                nxt = self.goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[state][ch] = nxt
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append([])
+                state = nxt
+            self.out[state].extend(outputs)
+
+        # Breadth-first failure links; each state also inherits the outputs of its failure state
+        pending = deque(self.goto[0].values())
+        while pending:
+            state = pending.popleft()
+            for ch, nxt in self.goto[state].items():
+                pending.append(nxt)
+                fallback = self.fail[state]
+                while fallback and ch not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[nxt] = self.goto[fallback].get(ch, 0)
+                self.out[nxt] = self.out[nxt] + self.out[self.fail[nxt]]
+
+    def find_all(self, text, folded=False):
+        """
+        Every (start, end, group, value) hit in text, ordered by start position (longest first on ties).
+        Offsets index hebrew_text.fold(text); pass folded=True if text already is.
+        """
+        if not folded:
+            text = hebrew_text.fold(text)
+        hits = []
+        if self.backend == "pyahocorasick":
+            if self.size:
+                for last, outputs in self.automaton.iter(text):
+                    for length, group, value in outputs:
+                        hits.append((last + 1 - length, last + 1, group, value))
+        else:
+            goto, fail, out = self.goto, self.fail, self.out
+            state = 0
+            for pos, ch in enumerate(text):
+                while state and ch not in goto[state]:
+                    state = fail[state]
+                state = goto[state].get(ch, 0)
+                for length, group, value in out[state]:
+                    hits.append((pos + 1 - length, pos + 1, group, value))
+        hits = [hit for hit in hits if hit[1] - hit[0] > SHORT_TERM_LENGTH or hit[2] not in WHOLE_WORD_GROUPS
+                or _whole_word(text, hit[0], hit[1])]
+        hits.sort(key=lambda hit: (hit[0], hit[0] - hit[1]))
+        return hits
+
+    def scan(self, text, folded=False):
+        """
+        {group: [values in order of first appearance]} for everything found in text.
+        """
+        groups = {}
+        for _, _, group, value in self.find_all(text, folded):
+            values = groups.setdefault(group, [])
+            if value not in values:
+                values.append(value)
+        return groups
+
+    def first(self, text, group, folded=False):
+        """
+        The leftmost hit of `group` in text as (start, end, value), or None.
+        """
+        for start, end, hit_group, value in self.find_all(text, folded):
+            if hit_group == group:
+                return start, end, value
+        return None
+
+    def first_token_match(self, norms, group):
+        """
+        The leftmost term of `group` that is made of whole tokens of `norms` (hebrew_text.tokenize_title()
+        norms), as (first, end, value) token indices, or None.
+        """
+        index = self.token_index.get(group)
+        for i in hebrew_text.positions(norms, self.token_starts.get(group, frozenset())):
+            for rest, value in index[norms[i]]:
+                end = i + 1 + len(rest)
+                if tuple(norms[i + 1:end]) == rest:
+                    return i, end, value
+        return None
+
+
+def _whole_word(text, start, end):
+    """
+    Whether text[start:end] is the whole word around it, or that word minus its prefix letters.
+    """
+    if end < len(text) and text[end].isalnum():
+        return False
+    word_start = start
+    while word_start and text[word_start - 1].isalnum():
+        word_start -= 1
+    return text[start:end] in hebrew_text.forms(text[word_start:end])
+
+
+def load_taxonomy(path=None):
+    """
+    Read the taxonomy file: {group: [term, ...] or {term: value}}. A list maps every term to itself.
+    """
+    with open(path or TAXONOMY_FILEPATH, 'r', encoding='utf-8') as f:
+        raw = json.load(f)
+    taxonomy = {}
+    for group, terms in raw.items():
+        taxonomy[group] = dict(terms) if isinstance(terms, dict) else {term: term for term in terms}
+    return taxonomy
+
+
+def build_matcher(taxonomy):
+    return KeywordMatcher((term, group, value)
+                          for group, terms in taxonomy.items() for term, value in terms.items())
+
+
+def get_matcher():
+    """
+    The process-wide matcher, built from the taxonomy file on first use.
+    """
+    global _matcher
+    if _matcher is None:
+        with _lock:
+            if _matcher is None:
+                try:
+                    _matcher = build_matcher(load_taxonomy())
+                except Exception as e:
+                    logging.error(f"Failed to load keyword taxonomy from {TAXONOMY_FILEPATH}: {e}")
+                    _matcher = KeywordMatcher([])
+                logging.debug(f"Keyword matcher built with {_matcher.size} terms")
+    return _matcher
+
+
+def reload(path=None):
+    """
+    Rebuild the matcher, e.g. after the taxonomy file was edited.
+    """
+    global _matcher
+    matcher = build_matcher(load_taxonomy(path))
+    with _lock:
+        _matcher = matcher
+    return matcher
+
+
+def group_terms(group):
+    """
+    The values of a taxonomy group, in file order (for callers that need the plain list).
+    """
+    try:
+        return list(dict.fromkeys(load_taxonomy().get(group, {}).values()))
+    except Exception as e:
+        logging.error(f"Failed to read taxonomy group '{group}': {e}")
+        return []
+
+
+def scan(text, folded=False):
+    return get_matcher().scan(text or "", folded)
+
+
+def first(text, group, folded=False):
+    return get_matcher().first(text or "", group, folded)
+
+
+def first_token_match(norms, group):
+    return get_matcher().first_token_match(norms, group)
@@ -0,0 +1,144 @@
+import logging
+import time
+import browser
+import pdf_links
+
+# Merkava carpub is an Angular app; its auction data arrives as JSON XHRs which we capture from the
+# DevTools performance log instead of splitting the rendered page text.
+MERKAVA_URL = "https://merkava.mrp.gov.il/carpub/index.html"
+MERKAVA_HOST = "merkava.mrp.gov.il"
+CAPTURE_TIMEOUT = 20
+# Stop once records arrived and no new JSON showed up for this long
+CAPTURE_QUIET_SECONDS = 1.0
+POLL_SECONDS = 0.25
+
+# The payload's field names are not documented; each deal field is read from the first key present.
+FIELD_KEYS = {
+    "auction_num": ["michrazNumber", "michrazNum", "MichrazNumber", "tenderNumber", "auctionNumber", "michrazId", "auctionId"],
+    "lot_num": ["lotNumber", "itemNumber", "pritNumber", "carNumber", "licenseNumber", "misparRechev"],
+    "title": ["michrazName", "MichrazName", "tenderName", "auctionName", "description", "title", "name"],
+    "location": ["location", "displayLocation", "address", "siteAddress", "site", "placeName"],
+    "opening_price": ["openingPrice", "startPrice", "minPrice", "minimumPrice", "mechirPtiha", "mechirMinimum"],
+    "manufacturer": ["manufacturer", "make", "tozeret", "yatzran", "manufacturerName"],
+    "model": ["model", "modelName", "degem", "kinuyMishari"],
+    "year": ["year", "productionYear", "shnatYitzur", "manufactureYear"],
+    "km": ["km", "mileage", "kilometers", "kilometrage"],
+    "close_date": ["endDate", "closeDate", "closingDate", "taarichSgira"],
+}
+
+
+def _first(record, field):
+    for key in FIELD_KEYS[field]:
+        value = record.get(key)
+        if value not in (None, ""):
+            return value
+    return None
+
+
+def _to_number(value):
+    if value is None:
+        return 0
+    try:
+        return int(float(str(value).replace(",", "").replace("₪", "").strip()))
+    except ValueError:
+        return 0
+
+
+def _is_vehicle(record):
+    return any(_first(record, field) is not None for field in ("lot_num", "manufacturer", "model"))
+
+
+def find_records(payload):
+    """
+    Walk a decoded JSON payload and return every dict that carries an auction number.
+    Vehicles nested inside an auction inherit the auction's scalar fields and replace it in the result.
+    """
+    records = []
+    stack = [(payload, {})]
+    while stack:
+        node, inherited = stack.pop()
+        if isinstance(node, list):
+            stack.extend((child, inherited) for child in reversed(node))
+        elif isinstance(node, dict):
+            record = {**inherited, **node}
+            if _first(record, "auction_num") is None:
+                stack.extend((v, inherited) for v in node.values() if isinstance(v, (list, dict)))
+                continue
+            vehicles = [child for v in node.values() if isinstance(v, list)
+                        for child in v if isinstance(child, dict) and _is_vehicle(child)]
+            if vehicles:
+                scalars = {k: v for k, v in record.items() if not isinstance(v, (list, dict))}
+                records.extend({**scalars, **vehicle} for vehicle in vehicles)
+            else:
+                records.append(record)
+    return records
+
+
+def record_to_deal(record):
+    """
+    Map one captured Merkava record (an auction, or a vehicle inside one) to a raw deal. The vehicle's make,
+    model, year and km are set as deal fields (model as "make model", like ai_parser's), so they don't
+    have to be parsed back out of the title.
+    """
+    auction_num = str(_first(record, "auction_num"))
+    lot_num = _first(record, "lot_num")
+    title = _first(record, "title") or "מכרז מקוון למכירת רכב ממשלתי משומש"
+    make, model, year = (_first(record, field) for field in ("manufacturer", "model", "year"))
+    vehicle = " ".join(str(v) for v in (make, model, year) if v)
+    if vehicle:
+        title = f"{title} - {vehicle}"
+
+    deal = {
+        "id": f"merkava_{auction_num}" + (f"_{lot_num}" if lot_num else ""),
+        "type": "car",
+        "title": f"{title} ({auction_num})",
+        "source": "מינהל הרכב / משטרה (מרכבה)",
+        "openingPrice": _to_number(_first(record, "opening_price")),
+        "marketValue": 0,
+        "timeLeft": _first(record, "location") or _first(record, "close_date") or "N/A",
+        "link": MERKAVA_URL,
+    }
+    if make:
+        deal["make"] = str(make).strip()
+    if make or model:
+        deal["model"] = " ".join(str(v).strip() for v in (make, model) if v)
+    year = _to_number(year)
+    if year:
+        deal["year"] = year
+    km = _to_number(_first(record, "km"))
+    if km:
+        deal["km"] = km
+    # Inspection reports and auction terms the record links to
+    pdf_links.attach_documents(deal, pdf_links.payload_documents(record, MERKAVA_URL))
+    return deal
+
+
+def capture_deals(driver, navigate=None, timeout=CAPTURE_TIMEOUT):
+    """
+    Load Merkava and yield raw deals from the JSON its Angular app fetches, each as soon as the response
+    carrying it is captured, so they can be enriched while later responses are still arriving.
+    `navigate(url)` loads the page (defaults to driver.get). The driver is left on the page either way.
+    Yields nothing if no auction records were seen before the timeout; stops once records arrived and no
+    new ones showed up for CAPTURE_QUIET_SECONDS.
+    """
+    capture = browser.NetworkCapture(driver, url_filter=MERKAVA_HOST)
+    capture.drain()
+    (navigate or driver.get)(MERKAVA_URL)
+
+    seen = set()
+    started = time.monotonic()
+    last_new = None
+    while time.monotonic() - started < timeout:
+        for url, payload in capture.poll():
+            records = find_records(payload)
+            if records:
+                logging.info(f"Captured {len(records)} Merkava records from {url}")
+                last_new = time.monotonic()
+            for record in records:
+                deal = record_to_deal(record)
+                if deal["id"] not in seen:
+                    seen.add(deal["id"])
+                    yield deal
+        if last_new is not None and time.monotonic() - last_new >= CAPTURE_QUIET_SECONDS:
+            break
+        time.sleep(POLL_SECONDS)
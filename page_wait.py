@@ -0,0 +1,81 @@
+import logging
+import time
+from selenium.webdriver.common.by import By
+
+# A readiness condition is a plain dict. Every key that is present must hold at the same time:
+#   "css":          CSS selector that must match at least "min_count" elements
+#   "xpath":        XPath that must match at least "min_count" elements
+#   "min_count":    minimum number of matches for "css"/"xpath" (default 1)
+#   "js":           JS snippet whose return value must be truthy
+#   "network_idle": milliseconds without a new resource request (and document.readyState == 'complete')
+#   "timeout":      maximum seconds to wait (default DEFAULT_TIMEOUT)
+#   "poll":         seconds between checks (default DEFAULT_POLL)
+DEFAULT_TIMEOUT = 15
+DEFAULT_POLL = 0.25
+
+RESOURCE_COUNT_JS = (
+    "return [document.readyState, "
+    "(window.performance && performance.getEntriesByType) ? performance.getEntriesByType('resource').length : 0];"
+)
+
+
+def _count_matches(driver, by, selector):
+    try:
+        return len(driver.find_elements(by, selector))
+    except Exception:
+        return 0
+
+
+def _check(driver, condition, idle_state):
+    """
+    Evaluate a condition once. idle_state carries the network-idle bookkeeping between polls.
+    """
+    min_count = condition.get("min_count", 1)
+    if "css" in condition and _count_matches(driver, By.CSS_SELECTOR, condition["css"]) < min_count:
+        return False
+    if "xpath" in condition and _count_matches(driver, By.XPATH, condition["xpath"]) < min_count:
+        return False
+    if "js" in condition:
+        try:
+            if not driver.execute_script(condition["js"]):
+                return False
+        except Exception:
+            return False
+    if "network_idle" in condition:
+        try:
+            ready_state, resource_count = driver.execute_script(RESOURCE_COUNT_JS)
+        except Exception:
+            return False
+        now = time.monotonic()
+        if resource_count != idle_state.get("count"):
+            idle_state["count"] = resource_count
+            idle_state["since"] = now
+            return False
+        if ready_state != "complete":
+            return False
+        if (now - idle_state["since"]) * 1000 < condition["network_idle"]:
+            return False
+    return True
+
+
+def wait_until_ready(driver, condition, label="page"):
+    """
+    Poll a readiness condition until it holds or its timeout expires.
+    Returns True when the page became ready, False on timeout (the caller can still parse what is there).
+    """
+    if not condition:
+        return True
+    timeout = condition.get("timeout", DEFAULT_TIMEOUT)
+    poll = condition.get("poll", DEFAULT_POLL)
+    started = time.monotonic()
+    deadline = started + timeout
+    idle_state = {}
+
+    while True:
+        if _check(driver, condition, idle_state):
+            logging.info(f"{label} ready after {time.monotonic() - started:.1f}s")
+            return True
+        if time.monotonic() >= deadline:
+            logging.warning(f"{label} not ready after {timeout}s, continuing with current page state")
+            return False
+        time.sleep(poll)
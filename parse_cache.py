@@ -0,0 +1,144 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+# Memoized title parsing. The same tender titles come back run after run, so ai_parser's per-type
+# results are cached in two tiers: an in-process LRU, backed by an on-disk store that survives runs.
+# Entries are keyed by (deal type, normalized title); the store is tagged with the parser version,
+# a hash of the parser sources and the keyword taxonomy, so editing any rule drops it automatically.
+PARSE_CACHE_FILEPATH = os.path.join('.cache', 'parse_cache.json')
+MEMORY_ENTRIES = 5000
+DISK_ENTRIES = 50000
+
+_lock = threading.Lock()
+_memory = OrderedDict()   # {(type, title): parsed}, least recently used first
+_disk = None              # OrderedDict {"type|title": parsed}, loaded on first use
+_dirty = False
+_version = None
+_stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+
+
+def rules_version(*paths):
+    """
+    Hash of the files that define the parsing rules. Missing files count as empty.
+    """
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(os.path.basename(path).encode('utf-8'))
+        try:
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+        except OSError:
+            pass
+    return digest.hexdigest()[:16]
+
+
+def normalize_title(title):
+    return " ".join((title or "").split())
+
+
+def _load_disk():
+    global _disk
+    if _disk is not None:
+        return
+    _disk = OrderedDict()
+    if not os.path.exists(PARSE_CACHE_FILEPATH):
+        return
+    try:
+        with open(PARSE_CACHE_FILEPATH, 'r', encoding='utf-8') as f:
+            stored = json.load(f)
+    except Exception as e:
+        logging.warning(f"Ignoring unreadable parse cache: {e}")
+        return
+    if stored.get("version") != _version:
+        logging.info("Parser rules changed since the parse cache was written, starting it over")
+        return
+    _disk.update(stored.get("entries", {}))
+
+
+def configure(version):
+    """
+    Set the parser version. A version change empties both tiers.
+    """
+    global _version, _disk, _dirty
+    with _lock:
+        if version == _version:
+            return
+        _version = version
+        _memory.clear()
+        _disk = None
+        _dirty = False
+
+
+def _remember(key, parsed):
+    _memory[key] = parsed
+    _memory.move_to_end(key)
+    while len(_memory) > MEMORY_ENTRIES:
+        _memory.popitem(last=False)
+
+
+def lookup(deal_type, title):
+    """
+    A copy of the cached parse result for this deal type and title, or None on a miss.
+    """
+    normalized = normalize_title(title)
+    key = (deal_type, normalized)
+    disk_key = f"{deal_type}|{normalized}"
+    with _lock:
+        parsed = _memory.get(key)
+        if parsed is not None:
+            _memory.move_to_end(key)
+            _stats["memory_hits"] += 1
+            return dict(parsed)
+        _load_disk()
+        parsed = _disk.get(disk_key)
+        if parsed is not None:
+            _disk.move_to_end(disk_key)
+            _stats["disk_hits"] += 1
+            _remember(key, parsed)
+            return dict(parsed)
+        _stats["misses"] += 1
+        return None
+
+
+def store(deal_type, title, parsed):
+    global _dirty
+    normalized = normalize_title(title)
+    with _lock:
+        _load_disk()
+        _remember((deal_type, normalized), dict(parsed))
+        disk_key = f"{deal_type}|{normalized}"
+        _disk[disk_key] = dict(parsed)
+        _disk.move_to_end(disk_key)
+        _dirty = True
+
+
+def save():
+    """
+    Write the on-disk tier, keeping the DISK_ENTRIES most recently used titles.
+    """
+    global _dirty
+    with _lock:
+        if _disk is None or not _dirty:
+            return
+        while len(_disk) > DISK_ENTRIES:
+            _disk.popitem(last=False)
+        try:
+            os.makedirs(os.path.dirname(PARSE_CACHE_FILEPATH) or '.', exist_ok=True)
+            tmp_path = PARSE_CACHE_FILEPATH + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({"version": _version, "entries": _disk}, f, ensure_ascii=False)
+            os.replace(tmp_path, PARSE_CACHE_FILEPATH)
+            _dirty = False
+        except OSError as e:
+            logging.warning(f"Failed to save parse cache: {e}")
+
+
+def get_stats():
+    with _lock:
+        lookups = sum(_stats.values())
+        hits = _stats["memory_hits"] + _stats["disk_hits"]
+        return dict(_stats, hit_rate=round(hits / lookups, 3) if lookups else 0.0)
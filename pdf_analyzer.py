@@ -1,8 +1,33 @@
+import hashlib
+import json
 import os
-import re
+import tempfile
+import threading
 import requests
 import logging
-from PyPDF2 import PdfReader
+from urllib.parse import urlsplit
+from requests.adapters import HTTPAdapter
+import browser
+import hebrew_text
+import http_cache
+import pdf_cache
+import pdf_extract
+import pdf_links
+
+# PDFs are streamed into a SpooledTemporaryFile: kept in memory up to IN_MEMORY_PDF_BYTES, then moved to an
+# anonymous temp file (no name on disk, so concurrent analyses can't collide). Larger than MAX_PDF_BYTES
+# and the download is abandoned.
+MAX_PDF_BYTES = int(os.environ.get('PDF_MAX_BYTES', str(40 * 1024 * 1024)))
+IN_MEMORY_PDF_BYTES = 8 * 1024 * 1024
+PDF_TIMEOUT = 10
+# Concurrency: the enrichment pipeline's risk stage runs PDF_WORKERS downloads at once, and no more than
+# PER_HOST_LIMIT against one host.
+PDF_WORKERS = int(os.environ.get('PDF_WORKERS', '4'))
+PER_HOST_LIMIT = int(os.environ.get('PDF_PER_HOST', '2'))
+
+_session = None
+_session_lock = threading.Lock()
+_host_slots = {}
 
 # List of critical negative keywords to flag
 RISK_KEYWORDS = [
@@ -12,54 +37,285 @@ RISK_KEYWORDS = [
     "שעבוד", "עיקול"
 ]
 
-def analyze_pdf_for_risks(pdf_url, filename="temp_tender.pdf"):
+# Pages scanned per document at most; the rest of a very long booklet is skipped
+MAX_RISK_PAGES = int(os.environ.get('PDF_MAX_PAGES', '200'))
+# Documents scanned per deal at most (tender booklet first, then appraisals and the rest)
+MAX_DEAL_DOCUMENTS = int(os.environ.get('PDF_MAX_DEAL_DOCUMENTS', '6'))
+
+
+def compile_risk_phrases(keywords):
     """
-    Downloads a PDF from a URL and scans it for risk keywords.
-    Returns a list of identified risk flags.
+    Keywords as folded token sequences, indexed by their first token. A keyword matches whole tokens, so
+    "שריפה" doesn't fire inside another word, but prefixed forms ("והשריפה", "בשעבוד") and any
+    quote/geresh/final-letter spelling do. Returns (index, longest phrase length in words).
+    """
+    index = {}
+    for keyword in keywords:
+        phrase = hebrew_text.phrase_tokens(keyword)
+        if phrase:
+            index.setdefault(phrase[0], []).append((phrase, keyword))
+    return index, max((len(p) for entries in index.values() for p, _ in entries), default=1)
+
+
+RISK_PHRASES, RISK_MAX_WORDS = compile_risk_phrases(RISK_KEYWORDS)
+
+# Bump when RiskScanner's matching changes; cached results of older versions are then re-scanned
+SCANNER_VERSION = 1
+# Identifies the risk results stored in pdf_cache: a new keyword list re-scans the cached page text
+RISK_VERSION = hashlib.sha256(json.dumps([SCANNER_VERSION, MAX_RISK_PAGES, RISK_KEYWORDS],
+                                         ensure_ascii=False).encode('utf-8')).hexdigest()[:16]
+
+
+class RiskScanner:
+    """
+    Incremental keyword scanner fed one page of text at a time. Only the current page and the last few
+    words of the previous one (for phrases broken across pages) are held. hits maps each keyword to
+    the page and character offset of its first occurrence; done turns True once every keyword was seen.
+    """
+
+    def __init__(self, keywords=None):
+        if keywords is None:
+            self.keywords, self.index, self.max_words = RISK_KEYWORDS, RISK_PHRASES, RISK_MAX_WORDS
+        else:
+            self.keywords = list(keywords)
+            self.index, self.max_words = compile_risk_phrases(self.keywords)
+        self.hits = {}
+        self.pages = 0
+        self._carry = []
+
+    @property
+    def done(self):
+        return len(self.hits) == len(self.keywords)
+
+    def feed(self, page, text):
+        """
+        Scan one page. Returns True when there is nothing left to look for.
+        """
+        self.pages += 1
+        words = self._carry + [(t.norm, page, t.start) for t in hebrew_text.tokenize(text or "")
+                               if t.kind != "punct"]
+        norms = [w[0] for w in words]
+        for i, word in enumerate(norms):
+            for form in hebrew_text.forms(word):
+                for phrase, keyword in self.index.get(form, ()):
+                    if keyword not in self.hits and tuple(norms[i + 1:i + len(phrase)]) == phrase[1:]:
+                        self.hits[keyword] = {"page": words[i][1], "offset": words[i][2]}
+        # Words a phrase starting near the end of this page may still need
+        self._carry = words[len(words) - (self.max_words - 1):] if self.max_words > 1 else []
+        return self.done
+
+    def found(self):
+        """
+        Keywords seen so far, in keyword-list order.
+        """
+        return [keyword for keyword in self.keywords if keyword in self.hits]
+
+
+def scan_pages(pages, max_pages=MAX_RISK_PAGES, keywords=None):
+    """
+    Feed (page_number, text) pairs to a RiskScanner, stopping once every keyword was found or after
+    max_pages. `pages` may be a lazy generator, so pages past the stop point are never extracted.
+    """
+    scanner = RiskScanner(keywords)
+    for page, text in pages:
+        if scanner.feed(page, text):
+            break
+        # Checked after feeding, so the page past the budget is never pulled from (and extracted by) `pages`
+        if scanner.pages >= max_pages:
+            logging.info(f"Risk scan stopped at the {max_pages}-page budget")
+            break
+    return scanner
+
+
+def find_risk_keywords(text):
+    """
+    Risk keywords present in text, in RISK_KEYWORDS order.
     """
-    found_risks = []
-    
-    if not pdf_url or not pdf_url.lower().endswith('.pdf'):
-        return found_risks
+    return scan_pages([(1, text)]).found()
 
+
+def get_session():
+    """
+    Pooled session shared by every PDF download thread.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=8, pool_maxsize=max(PDF_WORKERS, PER_HOST_LIMIT), max_retries=1)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers.update({"User-Agent": browser.USER_AGENT, "Accept": "application/pdf,*/*"})
+            _session = session
+    return _session
+
+
+def _host_slot(url):
+    host = urlsplit(url).netloc.lower()
+    with _session_lock:
+        if host not in _host_slots:
+            _host_slots[host] = threading.BoundedSemaphore(PER_HOST_LIMIT)
+        return _host_slots[host]
+
+
+def _download(pdf_url):
+    """
+    download_pdf() plus the response, whose ETag and from_cache identify the bytes for pdf_cache.
+    """
+    buffer = tempfile.SpooledTemporaryFile(max_size=IN_MEMORY_PDF_BYTES)
     try:
-        # Download the file
-        logging.info(f"Downloading PDF for risk analysis: {pdf_url}")
-        response = requests.get(pdf_url, timeout=10)
+        with _host_slot(pdf_url):
+            # Cached on disk and revalidated with ETag/Last-Modified, so unchanged booklets aren't re-downloaded
+            response = http_cache.cached_download(pdf_url, buffer, session=get_session(), source="pdf",
+                                                  max_bytes=MAX_PDF_BYTES, timeout=PDF_TIMEOUT)
         response.raise_for_status()
-        
-        with open(filename, 'wb') as f:
-            f.write(response.content)
-            
-        # Parse the PDF text
-        reader = PdfReader(filename)
-        full_text = ""
-        for page in reader.pages:
-            full_text += page.extract_text() + " "
-            
-        # Optional: remove the temp file
-        if os.path.exists(filename):
-            os.remove(filename)
-            
-        # Look for keywords
-        for keyword in RISK_KEYWORDS:
-            if re.search(rf'\b{keyword}\b', full_text):
-                found_risks.append(keyword)
-                
+    except Exception:
+        buffer.close()
+        raise
+    buffer.seek(0)
+    return buffer, response
+
+
+def download_pdf(pdf_url):
+    """
+    Stream a PDF into a spooled buffer (memory, or an anonymous temp file past IN_MEMORY_PDF_BYTES),
+    rewound and ready for pdf_extract. The caller closes it. Raises http_cache.BodyTooLarge over MAX_PDF_BYTES.
+    """
+    return _download(pdf_url)[0]
+
+
+def _resolve(pdf_url):
+    """
+    (content digest, cached document or None, open buffer or None) for a PDF URL. A URL checked within
+    the PDF TTL is answered from the URL index without a request; otherwise the PDF is downloaded (or
+    revalidated) and hashed, unless a 304 confirmed the ETag the digest was recorded under.
+    """
+    digest = pdf_cache.fresh_digest(pdf_url)
+    document = pdf_cache.load_document(digest) if digest else None
+    if document is not None:
+        return digest, document, None
+    logging.info(f"Downloading PDF for risk analysis: {pdf_url}")
+    buffer, response = _download(pdf_url)
+    try:
+        etag = response.headers.get('ETag')
+        digest = (response.from_cache and pdf_cache.known_digest(pdf_url, etag)) or pdf_cache.content_digest(buffer)
+        pdf_cache.remember_url(pdf_url, etag, digest)
+        return digest, pdf_cache.load_document(digest), buffer
+    except Exception:
+        buffer.close()
+        raise
+
+
+def _document_pages(pdf_url, digest, document, state):
+    """
+    (page number, text) for the document: the cached text first, then (only if the scan asks for more)
+    the remaining pages extracted by pdf_extract, downloading the PDF if state has no buffer yet.
+    Extracted pages are appended to the cache as they come, so only the page being scanned is in memory;
+    state collects the buffers and files opened and the extractor.
+    """
+    cached = 0
+    for cached, text in enumerate(pdf_cache.iter_pages(digest), start=1):
+        yield cached, text
+    if document["page_count"] is not None and cached >= document["page_count"]:
+        return
+    if not state["buffers"]:
+        logging.info(f"Downloading PDF to extract pages past the cached text: {pdf_url}")
+        state["buffers"].append(download_pdf(pdf_url))
+    extractor = state["extractor"] = pdf_extract.PageExtractor(state["buffers"][0], start=cached, end=MAX_RISK_PAGES)
+    document["page_count"] = extractor.page_count
+    pages_file = state["pages_file"] = pdf_cache.open_pages(digest)
+    for number, text in extractor:
+        pdf_cache.write_page(pages_file, text)
+        yield number, text
+
+
+def analyze_pdf_risk_hits(pdf_url):
+    """
+    Scans a PDF page by page for risk keywords, through pdf_cache: a document already scanned with the
+    current RISK_VERSION costs nothing, one scanned with an older keyword list is re-scanned from its
+    cached text, and only new documents are downloaded and extracted.
+    Returns {keyword: {"page": n, "offset": k}} for the first occurrence of each keyword found.
+    A PDF over MAX_PDF_BYTES is skipped ({}); any other failure is raised, so the caller doesn't take an
+    unread document for a clean one.
+    """
+    if not pdf_links.is_pdf_url(pdf_url):
+        return {}
+
+    state = {"buffers": [], "extractor": None, "pages_file": None}
+    pages = None
+    try:
+        digest, document, buffer = _resolve(pdf_url)
+        if buffer is not None:
+            state["buffers"].append(buffer)
+        with pdf_cache.document_lock(digest):
+            # Another deal sharing this PDF may have scanned it while this one waited
+            document = pdf_cache.load_document(digest) or document
+            if document is not None and RISK_VERSION in document["results"]:
+                pdf_cache.count("content_hits")
+                return document["results"][RISK_VERSION]
+            pdf_cache.count("rescans" if document is not None else "misses")
+            document = document or {"page_count": None, "results": {}}
+
+            # Pages are extracted lazily, only past the cached text and only until the scan stops
+            pages = _document_pages(pdf_url, digest, document, state)
+            scanner = scan_pages(pages)
+            if state["extractor"] is None or not state["extractor"].timed_out:
+                document["results"][RISK_VERSION] = scanner.hits
+            # A document cut short by the time budget keeps its text but no result, so the next run
+            # re-scans the cached pages and extracts from where this one stopped
+            pdf_cache.save_document(digest, document)
+            return scanner.hits
+
+    except http_cache.BodyTooLarge as e:
+        logging.warning(f"Skipping PDF risk analysis: {e}")
     except Exception as e:
         logging.warning(f"Failed to analyze PDF {pdf_url}: {e}")
-        
-    return found_risks
+        raise
+    finally:
+        if pages is not None:
+            pages.close()
+        if state["pages_file"] is not None:
+            state["pages_file"].close()
+        for buffer in state["buffers"]:
+            buffer.close()
+
+    return {}
+
+def analyze_pdf_for_risks(pdf_url):
+    """
+    Downloads a PDF from a URL and scans it for risk keywords.
+    Returns a list of identified risk flags.
+    """
+    hits = analyze_pdf_risk_hits(pdf_url)
+    return [keyword for keyword in RISK_KEYWORDS if keyword in hits]
+
+def deal_documents(deal):
+    """
+    URLs of the PDFs to scan for a deal: its pdf_link first, then the other documents found for it.
+    """
+    urls = [deal["pdf_link"]] if deal.get("pdf_link") else []
+    urls += [d["url"] for d in deal.get("documents", ()) if d.get("url") not in urls]
+    return urls[:MAX_DEAL_DOCUMENTS]
+
+def _set_risk_fields(deal, hits):
+    # risk_flags keeps its list shape for the UI; risk_evidence says where (which document, page and
+    # offset) each flag was first found
+    deal["risk_flags"] = [keyword for keyword in RISK_KEYWORDS if keyword in hits]
+    deal["risk_evidence"] = {keyword: hits[keyword] for keyword in deal["risk_flags"]}
+    if deal["risk_flags"]:
+        logging.info(f"Identified risks for {deal.get('id')}: {deal['risk_flags']}")
 
 def append_risk_analysis(deal):
     """
-    Appends a risk analysis field to a deal if a direct PDF link is available.
+    Appends a risk analysis field to a deal from every document it has (pdf_link and the documents
+    discovery or the source attached), if any. Raises if one of them couldn't be analyzed.
     """
-    if "pdf_link" in deal and deal["pdf_link"]:
-        risks = analyze_pdf_for_risks(deal["pdf_link"])
-        if risks:
-            deal["risk_flags"] = risks
-            logging.info(f"Identified risks for {deal.get('id')}: {risks}")
-        else:
-            deal["risk_flags"] = []
+    urls = deal_documents(deal)
+    if not urls:
+        return deal
+    hits = {}
+    for url in urls:
+        for keyword, hit in analyze_pdf_risk_hits(url).items():
+            hits.setdefault(keyword, dict(hit, url=url))
+    _set_risk_fields(deal, hits)
     return deal
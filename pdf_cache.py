@@ -0,0 +1,205 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import http_cache
+
+# Content-addressed cache of PDF analysis. Each document is keyed by the sha256 of its bytes and stores
+# the text of the pages extracted so far plus the risk hits computed per keyword-list version, so a
+# vocabulary change re-scans stored text instead of downloading and extracting again. Page text lives in
+# its own JSON-lines file, appended one page at a time as pages are extracted and read back one page at a
+# time, so a long booklet's text is never held whole; the document file only has the page count and results.
+# A URL index remembers which digest a URL (and ETag) resolved to; within the HTTP cache's PDF TTL the
+# document isn't requested at all, and a 304 revalidation with the same ETag reuses the digest without rehashing.
+PDF_CACHE_DIR = os.environ.get('PDF_CACHE_DIR', os.path.join('.cache', 'pdf_text'))
+URL_INDEX_FILENAME = 'urls.json'
+URL_TTL = http_cache.TTLS["pdf"]
+MAX_DOCUMENTS = 2000
+HASH_CHUNK_SIZE = 1024 * 1024
+
+_lock = threading.RLock()
+_document_locks = {}
+_urls = None
+_stats = {"url_hits": 0, "content_hits": 0, "rescans": 0, "misses": 0}
+
+
+def _url_index_path():
+    return os.path.join(PDF_CACHE_DIR, URL_INDEX_FILENAME)
+
+
+def _document_path(digest):
+    return os.path.join(PDF_CACHE_DIR, f"{digest}.json")
+
+
+def _pages_path(digest):
+    return os.path.join(PDF_CACHE_DIR, f"{digest}.pages.jsonl")
+
+
+def document_lock(digest):
+    """
+    Held while a document is scanned, so two deals sharing a PDF don't both append its pages.
+    """
+    with _lock:
+        return _document_locks.setdefault(digest, threading.Lock())
+
+
+def _write_json(path, data):
+    os.makedirs(PDF_CACHE_DIR, exist_ok=True)
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def _load_urls():
+    global _urls
+    if _urls is None:
+        _urls = {}
+        if os.path.exists(_url_index_path()):
+            try:
+                with open(_url_index_path(), 'r', encoding='utf-8') as f:
+                    _urls = json.load(f)
+            except Exception as e:
+                logging.warning(f"Ignoring unreadable PDF URL index: {e}")
+    return _urls
+
+
+def content_digest(fileobj):
+    """
+    sha256 of a file object's contents, read in chunks; the file is rewound afterwards.
+    """
+    digest = hashlib.sha256()
+    fileobj.seek(0)
+    for chunk in iter(lambda: fileobj.read(HASH_CHUNK_SIZE), b""):
+        digest.update(chunk)
+    fileobj.seek(0)
+    return digest.hexdigest()
+
+
+def fresh_digest(url):
+    """
+    The digest a URL resolved to, if it was checked within URL_TTL and its document is still cached.
+    """
+    with _lock:
+        entry = _load_urls().get(url)
+        if entry and time.time() - entry.get("checked_at", 0) < URL_TTL \
+                and os.path.exists(_document_path(entry["digest"])):
+            _stats["url_hits"] += 1
+            return entry["digest"]
+    return None
+
+
+def known_digest(url, etag):
+    """
+    The digest recorded for this URL under the same ETag (for 304 revalidations), or None.
+    """
+    if not etag:
+        return None
+    with _lock:
+        entry = _load_urls().get(url)
+        if entry and entry.get("etag") == etag:
+            return entry["digest"]
+    return None
+
+
+def remember_url(url, etag, digest):
+    with _lock:
+        _load_urls()[url] = {"etag": etag, "digest": digest, "checked_at": time.time()}
+        try:
+            _write_json(_url_index_path(), _urls)
+        except OSError as e:
+            logging.warning(f"Failed to save PDF URL index: {e}")
+
+
+def load_document(digest):
+    """
+    {"page_count": n or None, "results": {risk_version: hits}} or None. The page text is read with iter_pages().
+    """
+    try:
+        with open(_document_path(digest), 'r', encoding='utf-8') as f:
+            document = json.load(f)
+        if "pages" in document:
+            # Written before page text moved to its own file
+            return None
+        os.utime(_document_path(digest))
+        return document
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logging.warning(f"Ignoring unreadable cached PDF text {digest}: {e}")
+        return None
+
+
+def iter_pages(digest):
+    """
+    Text of the document's cached pages, in order, one page in memory at a time. A line left torn by an
+    interrupted write is cut off, so pages appended later continue from the last complete one.
+    """
+    path = _pages_path(digest)
+    try:
+        f = open(path, 'rb')
+    except FileNotFoundError:
+        return
+    with f:
+        good = 0
+        for line in f:
+            try:
+                text = json.loads(line)
+            except ValueError:
+                logging.warning(f"Truncating torn cached PDF page text {digest} after byte {good}")
+                f.close()
+                with open(path, 'r+b') as torn:
+                    torn.truncate(good)
+                return
+            good += len(line)
+            yield text
+
+
+def open_pages(digest):
+    """
+    Append handle for the document's page text; write pages with write_page().
+    """
+    os.makedirs(PDF_CACHE_DIR, exist_ok=True)
+    return open(_pages_path(digest), 'a', encoding='utf-8')
+
+
+def write_page(pages_file, text):
+    pages_file.write(json.dumps(text, ensure_ascii=False) + "\n")
+    pages_file.flush()
+
+
+def save_document(digest, document):
+    with _lock:
+        try:
+            _write_json(_document_path(digest), document)
+            _evict()
+        except OSError as e:
+            logging.warning(f"Failed to cache PDF text {digest}: {e}")
+
+
+def _evict():
+    """
+    Keep the MAX_DOCUMENTS most recently used documents.
+    """
+    names = [n for n in os.listdir(PDF_CACHE_DIR) if n.endswith('.json') and n != URL_INDEX_FILENAME]
+    if len(names) <= MAX_DOCUMENTS:
+        return
+    paths = sorted((os.path.join(PDF_CACHE_DIR, n) for n in names), key=os.path.getmtime)
+    for path in paths[:len(paths) - MAX_DOCUMENTS]:
+        for stale in (path, path[:-len('.json')] + '.pages.jsonl'):
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+
+
+def count(event):
+    with _lock:
+        _stats[event] += 1
+
+
+def get_stats():
+    with _lock:
+        return dict(_stats)
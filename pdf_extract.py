@@ -0,0 +1,163 @@
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from PyPDF2 import PdfReader
+
+# Page text extraction for large PDFs. PyPDF2's extract_text is pure Python and CPU-bound, so long documents
+# are split into SHARD_PAGES-page ranges extracted by a shared process pool, a few shards ahead of the
+# consumer. Pages are still handed out lazily and in order: once the consumer stops (every keyword found,
+# page budget reached) or the per-document time budget runs out, shards not yet started are cancelled.
+# Short documents, and machines with a single core, extract on the calling thread.
+EXTRACT_PROCESSES = int(os.environ.get('PDF_EXTRACT_PROCESSES', str(min(4, os.cpu_count() or 1))))
+SHARD_PAGES = int(os.environ.get('PDF_SHARD_PAGES', '16'))
+# Fewer pages than this left to extract and the pool isn't worth the round trips
+MIN_PARALLEL_PAGES = 2 * SHARD_PAGES
+# Seconds of extraction allowed per document; pages past it are left for a later run
+DOCUMENT_TIME_BUDGET = float(os.environ.get('PDF_TIME_BUDGET', '60'))
+
+_pool = None
+_pool_lock = threading.Lock()
+# In a worker process: (path, PdfReader) of the last document, so consecutive shards don't re-parse it
+_worker_reader = None
+
+
+def get_pool():
+    """
+    Process pool shared by every extraction. Workers are spawned (not forked from the threaded scraper):
+    each starts a fresh interpreter that re-imports the main module, and everything it imports, before
+    this one, so entry points must keep their work behind `if __name__ == "__main__"`.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=EXTRACT_PROCESSES, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def _reset_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def extract_range(path, start, end):
+    """
+    Text of pages [start, end) of the PDF at path. Runs in a worker process.
+    """
+    global _worker_reader
+    if _worker_reader is None or _worker_reader[0] != path:
+        _worker_reader = (path, PdfReader(path))
+    pages = _worker_reader[1].pages
+    return [pages[i].extract_text() or "" for i in range(start, min(end, len(pages)))]
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _remove_when_done(path, futures):
+    """
+    Delete the file at path once none of the futures is running: now if they are all finished or
+    cancelled, otherwise from the done callback of the last one, so the consumer never waits on them.
+    """
+    running = [future for future in futures if not future.done()]
+    if not running:
+        _remove(path)
+        return
+    left = [len(running)]
+    lock = threading.Lock()
+
+    def finished(_):
+        with lock:
+            left[0] -= 1
+            last = left[0] == 0
+        if last:
+            _remove(path)
+
+    for future in running:
+        future.add_done_callback(finished)
+
+
+class PageExtractor:
+    """
+    Lazy (page number, text) iterator over a PDF file object, for page indexes [start, end) (end defaults
+    to the last page; no shard reaches past it). page_count is the document's full length, known up front;
+    timed_out turns True if the time budget ended the iteration early.
+    """
+
+    def __init__(self, fileobj, start=0, end=None, time_budget=None, processes=None, reader=None):
+        self.fileobj = fileobj
+        self.reader = reader or PdfReader(fileobj)
+        self.page_count = len(self.reader.pages)
+        self.start = start
+        self.end = self.page_count if end is None else min(end, self.page_count)
+        self.time_budget = DOCUMENT_TIME_BUDGET if time_budget is None else time_budget
+        self.processes = EXTRACT_PROCESSES if processes is None else processes
+        self.timed_out = False
+
+    def __iter__(self):
+        deadline = time.monotonic() + self.time_budget
+        if self.processes > 1 and self.end - self.start >= MIN_PARALLEL_PAGES:
+            return self._parallel(deadline)
+        return self._serial(self.start, deadline)
+
+    def _serial(self, start, deadline):
+        for index in range(start, self.end):
+            if time.monotonic() >= deadline:
+                self._stop(index)
+                return
+            yield index + 1, self.reader.pages[index].extract_text() or ""
+
+    def _parallel(self, deadline):
+        # Workers read the document from a named copy, written once
+        with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as copy:
+            self.fileobj.seek(0)
+            shutil.copyfileobj(self.fileobj, copy)
+        index = self.start
+        pending = []
+        submitted = []
+        try:
+            pool = get_pool()
+            shards = iter(range(self.start, self.end, SHARD_PAGES))
+            # One shard per process plus one queued, so the pool never idles while the consumer scans
+            for shard in shards:
+                pending.append(pool.submit(extract_range, copy.name, shard, min(shard + SHARD_PAGES, self.end)))
+                submitted.append(pending[-1])
+                if len(pending) > self.processes:
+                    break
+            while pending:
+                texts = pending.pop(0).result(timeout=max(0.0, deadline - time.monotonic()))
+                shard = next(shards, None)
+                if shard is not None:
+                    pending.append(pool.submit(extract_range, copy.name, shard, min(shard + SHARD_PAGES, self.end)))
+                    submitted.append(pending[-1])
+                for text in texts:
+                    index += 1
+                    yield index, text
+        except TimeoutError:
+            self._stop(index)
+        except BrokenProcessPool as e:
+            logging.warning(f"PDF extraction pool failed ({e}), continuing on this thread")
+            _reset_pool()
+            yield from self._serial(index, deadline)
+        finally:
+            for future in pending:
+                future.cancel()
+            # Shards already running (including one whose result timed out) still read the copy
+            _remove_when_done(copy.name, submitted)
+
+    def _stop(self, index):
+        self.timed_out = True
+        logging.info(f"PDF extraction stopped at page {index + 1}/{self.page_count}: "
+                     f"{self.time_budget:g}s document budget used up")
@@ -0,0 +1,329 @@
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from urllib.parse import unquote, urljoin, urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+import browser
+import html_parse
+import http_cache
+import keyword_engine
+
+# Document discovery: fetches each deal's `link` page and collects the PDFs it links to (tender booklets,
+# appraisals), so pdf_analyzer has a pdf_link to scan. Pages come through http_cache (revalidated with
+# ETag/Last-Modified), and the documents found are stored per page URL together with a hash of the page
+# body: within the deal_page TTL a page isn't requested at all, and a page that comes back byte-identical
+# isn't parsed again. Requests to one host are spaced HOST_INTERVAL apart, at most PER_HOST_LIMIT at once.
+# Pages rendered client-side (the Angular portals) expose no links in their HTML and yield nothing.
+# A deal records the digest of the page its documents came from (documents_digest), so a stored deal is
+# only reused while that page is fresh and unchanged (is_current).
+# Sources with structured payloads (CollectorsWebApi items, RAMI and Merkava records) attach the PDFs the
+# payload names up front (payload_documents), and those deals skip page discovery. A page that several
+# deals link to (a site root, a listing) is shared: only documents naming a deal's reference numbers go to it.
+PDF_LINKS_FILEPATH = os.path.join('.cache', 'pdf_links.json')
+PAGE_TIMEOUT = 10
+DISCOVERY_WORKERS = int(os.environ.get('DISCOVERY_WORKERS', '4'))
+PER_HOST_LIMIT = int(os.environ.get('DISCOVERY_PER_HOST', '2'))
+HOST_INTERVAL = float(os.environ.get('DISCOVERY_HOST_INTERVAL', '1.0'))
+# A page linking more PDFs than this is a listing shared by many deals: only documents that mention
+# one of the deal's reference numbers are attributed to it
+MAX_PAGE_DOCUMENTS = 6
+# Document kinds by taxonomy group, checked in order against the anchor text and file name
+DOCUMENT_KINDS = (("appraisal", "appraisal_document_word"), ("tender", "tender_document_word"))
+# Reference numbers in deal titles: tender/auction numbers like 123/2026 or (45678)
+REFERENCE_RE = re.compile(r"\d+(?:[/-]\d+)*")
+MIN_REFERENCE_DIGITS = 3
+# Seconds a page that failed to load is skipped, so deals sharing a broken link don't all retry it
+FAILURE_BACKOFF = 15 * 60
+# Payload fields that name the attachment next to its URL
+PAYLOAD_TITLE_KEYS = ("FileName", "fileName", "DisplayName", "displayName", "Name", "name", "Title", "title")
+
+_lock = threading.Lock()
+_pages = None       # {page url: {"digest", "documents", "checked_at", "shared"}, or {"failed_at"} / {"shared"}}
+_page_locks = {}    # one fetch per page even when many deals share a link
+_hosts = {}         # {host: {"slots": semaphore, "next": monotonic time of the next allowed request}}
+_session = None
+_dirty = False
+_deal_ids = {}      # {page url: ids of the deals linking to it this run}
+_stats = {"fresh": 0, "unchanged": 0, "parsed": 0, "failed": 0, "found": 0}
+
+
+def load():
+    global _pages
+    with _lock:
+        if _pages is None:
+            _pages = {}
+            if os.path.exists(PDF_LINKS_FILEPATH):
+                try:
+                    with open(PDF_LINKS_FILEPATH, 'r', encoding='utf-8') as f:
+                        _pages = json.load(f)
+                except Exception as e:
+                    logging.warning(f"Ignoring unreadable document link cache: {e}")
+        return _pages
+
+
+def save():
+    global _dirty
+    with _lock:
+        if _pages is None or not _dirty:
+            return
+        try:
+            os.makedirs(os.path.dirname(PDF_LINKS_FILEPATH), exist_ok=True)
+            tmp_path = PDF_LINKS_FILEPATH + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(_pages, f, ensure_ascii=False)
+            os.replace(tmp_path, PDF_LINKS_FILEPATH)
+            _dirty = False
+        except OSError as e:
+            logging.warning(f"Failed to save document link cache: {e}")
+
+
+def get_session():
+    global _session
+    with _lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=8, pool_maxsize=max(DISCOVERY_WORKERS, PER_HOST_LIMIT), max_retries=1)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers.update({"User-Agent": browser.USER_AGENT, "Accept": "text/html,*/*"})
+            _session = session
+    return _session
+
+
+@contextlib.contextmanager
+def _host_turn(url):
+    """
+    Hold one of the host's request slots, starting no sooner than HOST_INTERVAL after its previous request.
+    """
+    host = urlsplit(url).netloc.lower()
+    with _lock:
+        state = _hosts.setdefault(host, {"slots": threading.BoundedSemaphore(PER_HOST_LIMIT), "next": 0.0})
+    with state["slots"]:
+        with _lock:
+            now = time.monotonic()
+            wait = state["next"] - now
+            state["next"] = max(state["next"], now) + HOST_INTERVAL
+        if wait > 0:
+            time.sleep(wait)
+        yield
+
+
+def document_kind(text):
+    found = keyword_engine.scan(text)
+    for kind, group in DOCUMENT_KINDS:
+        if group in found:
+            return kind
+    return "document"
+
+
+def is_pdf_url(url):
+    """
+    Whether a URL's path names a PDF; a query string (?v=2) or fragment doesn't matter.
+    """
+    return bool(url) and urlsplit(url).path.lower().endswith('.pdf')
+
+
+def _document(url, text):
+    name = unquote(urlsplit(url).path.rsplit('/', 1)[-1])
+    return {"url": url, "title": text or name, "kind": document_kind(f"{text} {name}")}
+
+
+def extract_documents(html, base_url):
+    """
+    [{"url", "title", "kind"}] for every distinct PDF the page links to, in page order.
+    """
+    documents = {}
+    for href, text in html_parse.parse_page(html, only=["a"]).links():
+        url = urljoin(base_url, href.strip()).split('#', 1)[0]
+        if is_pdf_url(url) and url not in documents:
+            documents[url] = _document(url, text)
+    return list(documents.values())
+
+
+def payload_documents(payload, base_url):
+    """
+    [{"url", "title", "kind"}] for every distinct PDF URL anywhere in a decoded JSON record, titled by
+    the name field next to it, in payload order.
+    """
+    documents = {}
+    stack = [payload]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(reversed(node))
+            continue
+        if not isinstance(node, dict):
+            continue
+        title = next((node[k].strip() for k in PAYLOAD_TITLE_KEYS if isinstance(node.get(k), str)), "")
+        children = []
+        for value in node.values():
+            if isinstance(value, str) and is_pdf_url(value.strip()):
+                url = urljoin(base_url, value.strip()).split('#', 1)[0]
+                if url not in documents:
+                    documents[url] = _document(url, title)
+            elif isinstance(value, (list, dict)):
+                children.append(value)
+        stack.extend(reversed(children))
+    return list(documents.values())
+
+
+def attach_documents(deal, documents):
+    """
+    Set deal["documents"] and deal["pdf_link"] (the tender booklet if there is one, else the first document).
+    """
+    if documents:
+        deal["documents"] = documents
+        deal["pdf_link"] = next((d for d in documents if d["kind"] == "tender"), documents[0])["url"]
+    return deal
+
+
+def _page_lock(url):
+    with _lock:
+        return _page_locks.setdefault(url, threading.Lock())
+
+
+class PageUnavailable(Exception):
+    pass
+
+
+def page_documents(url):
+    """
+    (documents linked from a page, digest of the page body), from the cache while the page is fresh or
+    unchanged, otherwise fetched and parsed. Raises if the page can't be loaded (or failed to recently).
+    """
+    global _dirty
+    ttl = http_cache.TTLS["deal_page"]
+    with _page_lock(url):
+        entry = load().get(url) or {}
+        if time.time() - entry.get("failed_at", 0) < FAILURE_BACKOFF:
+            raise PageUnavailable(f"{url} failed to load less than {FAILURE_BACKOFF}s ago")
+        if time.time() - entry.get("checked_at", 0) < ttl:
+            with _lock:
+                _stats["fresh"] += 1
+            return entry["documents"], entry["digest"]
+
+        try:
+            with _host_turn(url):
+                response = http_cache.cached_get(url, session=get_session(), source="deal_page", timeout=PAGE_TIMEOUT)
+            response.raise_for_status()
+        except Exception:
+            with _lock:
+                _pages[url] = dict(entry, failed_at=time.time())
+                _dirty = True
+            raise
+        digest = hashlib.sha256(response.content).hexdigest()
+        if entry.get("digest") == digest:
+            documents, event = entry["documents"], "unchanged"
+        else:
+            if 'charset' not in (response.headers.get('Content-Type') or '').lower():
+                # requests falls back to ISO-8859-1 without a declared charset; Hebrew pages are UTF-8 or windows-1255
+                response.encoding = response.apparent_encoding
+            documents, event = extract_documents(response.text, response.url or url), "parsed"
+        with _lock:
+            _pages[url] = {"digest": digest, "documents": documents, "checked_at": time.time(),
+                           "shared": entry.get("shared", False)}
+            _dirty = True
+            _stats[event] += 1
+        return documents, digest
+
+
+def deal_references(deal):
+    """
+    Tender/auction numbers in a deal's title, e.g. "123/2026" and "45678".
+    """
+    references = set()
+    for match in REFERENCE_RE.finditer(deal.get("title", "")):
+        if sum(c.isdigit() for c in match.group()) >= MIN_REFERENCE_DIGITS:
+            references.add(match.group())
+    return references
+
+
+def note_deal(deal):
+    """
+    Count a deal against its link page as soon as it's scraped, so a page several deals link to is
+    known to be shared before any of them reaches discovery. Once seen shared, a page stays shared.
+    """
+    global _dirty
+    link = deal.get("link")
+    if not link or not deal.get("id"):
+        return
+    pages = load()
+    with _lock:
+        ids = _deal_ids.setdefault(link, set())
+        ids.add(deal["id"])
+        if len(ids) > 1:
+            entry = pages.setdefault(link, {})
+            if not entry.get("shared"):
+                entry["shared"] = True
+                _dirty = True
+
+
+def is_shared(url):
+    pages = load()
+    with _lock:
+        return len(_deal_ids.get(url, ())) > 1 or bool(pages.get(url, {}).get("shared"))
+
+
+def documents_for_deal(deal, documents, shared=False):
+    """
+    The documents of a page that belong to the deal: all of them on the deal's own page (if there are no
+    more than MAX_PAGE_DOCUMENTS), otherwise only those naming one of its reference numbers.
+    """
+    if not shared and len(documents) <= MAX_PAGE_DOCUMENTS:
+        return documents
+    references = deal_references(deal)
+    return [d for d in documents
+            if any(r in d["title"] or r in unquote(d["url"]) for r in references)]
+
+
+def _discovers(deal):
+    link = deal.get("link")
+    return bool(link) and link.startswith("http") and (not deal.get("pdf_link") or "documents_digest" in deal)
+
+
+def discover_deal_documents(deal):
+    """
+    attach_documents() from the deal's link page. Deals that came with a pdf_link (a source attached
+    its documents), or no link, are left as they are.
+    Raises if the page can't be loaded, so the deal isn't stored as having no documents.
+    """
+    if not _discovers(deal):
+        return deal
+    link = deal["link"]
+    try:
+        documents, digest = page_documents(link)
+    except Exception as e:
+        logging.warning(f"Document discovery failed for {link}: {e}")
+        with _lock:
+            _stats["failed"] += 1
+        raise
+    documents = documents_for_deal(deal, documents, is_shared(link))
+    deal["documents_digest"] = digest
+    if documents:
+        attach_documents(deal, documents)
+        with _lock:
+            _stats["found"] += 1
+    return deal
+
+
+def is_current(deal):
+    """
+    Whether the documents an enriched deal was stored with still stand: its link page was checked
+    within the deal_page TTL and hasn't changed since. Deals discovery doesn't apply to always are.
+    """
+    if not _discovers(deal):
+        return True
+    entry = load().get(deal["link"]) or {}
+    return (time.time() - entry.get("checked_at", 0) < http_cache.TTLS["deal_page"]
+            and entry.get("digest") == deal.get("documents_digest"))
+
+
+def get_stats():
+    with _lock:
+        return dict(_stats)
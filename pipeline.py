@@ -0,0 +1,229 @@
+import logging
+import queue
+import threading
+import time
+
+# Producer/consumer pipeline: items flow through a chain of stages, each with its own worker threads
+# and a bounded input queue. A full queue blocks the producer (backpressure), so scrapers can't run
+# arbitrarily far ahead of enrichment. Optional stages are the exception: when one is backed up, items
+# bypass it rather than block whoever is handing them on.
+DEFAULT_QUEUE_SIZE = 100
+MONITOR_INTERVAL = 10
+# How often a submit() blocked on a full queue checks whether the pipeline was closed meanwhile
+SUBMIT_POLL_SECONDS = 0.5
+
+_STOP = object()
+
+
+class PipelineClosed(RuntimeError):
+    """
+    Raised by submit() once close() has started: the pipeline takes no more items.
+    """
+
+
+class Stage:
+    """
+    One pipeline stage: func(item) -> item, run by `workers` threads reading from a bounded queue.
+    With batch_size > 1, func takes a list of up to batch_size items (whatever is already queued,
+    never waiting for more) and returns the list of results.
+    An optional stage (skip_when_full) never applies backpressure: an item arriving while its queue is
+    full goes straight on to the next stage, and the pipeline's on_skip is told.
+    """
+
+    def __init__(self, name, func, workers=1, maxsize=DEFAULT_QUEUE_SIZE, batch_size=1, skip_when_full=False):
+        self.name = name
+        self.skip_when_full = skip_when_full
+        self.func = func
+        self.workers = max(1, workers)
+        self.batch_size = max(1, batch_size)
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.threads = []
+        self.processed = 0
+        self.errors = 0
+        self.skipped = 0
+        self.busy_seconds = 0.0
+        self.lock = threading.Lock()
+
+
+class Pipeline:
+    """
+    Chain of Stages. submit() feeds the first stage; every finished item is passed to on_done, and
+    on_skip(item, stage name) is called for each optional stage an item bypassed.
+    A stage that raises logs the error, calls on_error(item, stage name) and passes the item on unchanged.
+    Once close() has started, submit() raises PipelineClosed instead of queueing.
+    """
+
+    def __init__(self, stages, on_done=None, on_skip=None, on_error=None):
+        self.stages = stages
+        self.on_done = on_done
+        self.on_skip = on_skip
+        self.on_error = on_error
+        self.started_at = None
+        self._monitor = None
+        self._closing = threading.Event()
+        self._closed = threading.Event()
+        self._abandoned = threading.Event()
+
+    def start(self, monitor_interval=MONITOR_INTERVAL):
+        self.started_at = time.monotonic()
+        for index, stage in enumerate(self.stages):
+            for n in range(stage.workers):
+                thread = threading.Thread(target=self._run_stage, args=(index,),
+                                          name=f"pipeline-{stage.name}-{n}", daemon=True)
+                thread.start()
+                stage.threads.append(thread)
+        if monitor_interval:
+            self._monitor = threading.Thread(target=self._run_monitor, args=(monitor_interval,),
+                                             name="pipeline-monitor", daemon=True)
+            self._monitor.start()
+        return self
+
+    @property
+    def closing(self):
+        """
+        True once close() has started (whether or not it finished or gave up).
+        """
+        return self._closing.is_set()
+
+    def submit(self, item):
+        """
+        Queue an item for the first stage; blocks while that stage's queue is full (unless it is optional).
+        Raises PipelineClosed if close() has started, also while blocked: the workers may be gone, so the
+        item would never be taken.
+        """
+        if self._closing.is_set():
+            raise PipelineClosed("Pipeline is closed")
+        first = self.stages[0] if self.stages else None
+        if first is None or first.skip_when_full:
+            self._forward(0, item)
+            return
+        while True:
+            try:
+                first.queue.put(item, timeout=SUBMIT_POLL_SECONDS)
+                return
+            except queue.Full:
+                if self._closing.is_set():
+                    raise PipelineClosed("Pipeline closed while the item waited for room")
+
+    def _forward(self, index, item):
+        """
+        Hand an item to stage `index`, skipping full optional stages; past the last stage it is done.
+        """
+        while index < len(self.stages):
+            stage = self.stages[index]
+            if not stage.skip_when_full:
+                stage.queue.put(item)
+                return
+            try:
+                stage.queue.put_nowait(item)
+                return
+            except queue.Full:
+                with stage.lock:
+                    stage.skipped += 1
+                self._callback("skip", self.on_skip, item, stage.name)
+                index += 1
+        self._callback("completion", self.on_done, item)
+
+    @staticmethod
+    def _callback(kind, callback, *args):
+        if callback is None:
+            return
+        try:
+            callback(*args)
+        except Exception as e:
+            logging.warning(f"Pipeline {kind} callback failed: {e}")
+
+    def _run_stage(self, index):
+        stage = self.stages[index]
+        stopping = False
+        while not stopping:
+            item = stage.queue.get()
+            if item is _STOP or self._abandoned.is_set():
+                return
+            batch = [item]
+            while len(batch) < stage.batch_size:
+                try:
+                    item = stage.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    # This worker's own stop signal: finish the batch, then exit
+                    stopping = True
+                    break
+                batch.append(item)
+
+            started = time.monotonic()
+            try:
+                results = stage.func(batch) if stage.batch_size > 1 else [stage.func(batch[0])]
+            except Exception as e:
+                logging.warning(f"Pipeline stage '{stage.name}' failed: {e}")
+                with stage.lock:
+                    stage.errors += 1
+                for item in batch:
+                    self._callback("error", self.on_error, item, stage.name)
+                results = batch
+            with stage.lock:
+                stage.processed += len(batch)
+                stage.busy_seconds += time.monotonic() - started
+            if self._abandoned.is_set():
+                # close() gave up on this pipeline; whatever is still in flight is dropped unfinished
+                return
+            for item in results:
+                self._forward(index + 1, item)
+
+    def close(self, timeout=None):
+        """
+        Wait until every submitted item went through all stages, then stop the workers; nothing can be
+        submitted from the moment this is called. Stages are drained in order, so nothing queued is lost. With a timeout (seconds), gives up once
+        it expires: the pipeline is abandoned (workers stop taking items, on_done isn't called again)
+        and False is returned. Returns True when everything finished.
+        """
+        self._closing.set()
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        def remaining():
+            return None if deadline is None else max(0.0, deadline - time.monotonic())
+
+        try:
+            for stage in self.stages:
+                for _ in stage.threads:
+                    stage.queue.put(_STOP, timeout=remaining())
+                for thread in stage.threads:
+                    thread.join(remaining())
+                    if thread.is_alive():
+                        raise queue.Full
+        except queue.Full:
+            self._abandoned.set()
+            logging.warning(f"Enrichment pipeline didn't drain within {timeout:.0f}s; abandoning unfinished items")
+        self._closed.set()
+        self.log_stats()
+        return not self._abandoned.is_set()
+
+    def stats(self):
+        """
+        Per-stage queue depth, processed count, throughput (items/s since start) and worker utilisation.
+        """
+        elapsed = max(1e-9, time.monotonic() - (self.started_at or time.monotonic()))
+        rows = []
+        for stage in self.stages:
+            with stage.lock:
+                rows.append({
+                    "stage": stage.name,
+                    "depth": stage.queue.qsize(),
+                    "processed": stage.processed,
+                    "errors": stage.errors,
+                    "skipped": stage.skipped,
+                    "per_sec": round(stage.processed / elapsed, 2),
+                    "utilisation": round(stage.busy_seconds / (elapsed * stage.workers), 2),
+                })
+        return rows
+
+    def log_stats(self):
+        summary = ", ".join(f"{r['stage']}: depth={r['depth']} done={r['processed']} {r['per_sec']}/s "
+                            f"util={r['utilisation']:.0%}" + (f" skipped={r['skipped']}" if r['skipped'] else "")
+                            for r in self.stats())
+        logging.info(f"Enrichment pipeline: {summary}")
+
+    def _run_monitor(self, interval):
+        while not self._closed.wait(interval):
+            self.log_stats()
@@ -0,0 +1,144 @@
+import logging
+from datetime import datetime
+import requests
+import govil_api
+import pdf_links
+
+# Israel Land Authority (RAMI) tenders search API behind the MichrazimSite Angular app (see debug_rami_api.py)
+RAMI_SEARCH_API = "https://apps.land.gov.il/MichrazimSite/api/MichrazimApi/Search"
+RAMI_SITE_URL = "https://apps.land.gov.il/MichrazimSite/"
+RAMI_PAGE_SIZE = 100
+RAMI_MAX_PAGES = 50
+HTTP_TIMEOUT = 20
+
+# The API's field names are not documented; each deal field is read from the first key present.
+FIELD_KEYS = {
+    "tender_num": ["MichrazID", "MichrazId", "michrazId", "MichrazNum", "michrazNum", "MisparMichraz", "TenderNumber"],
+    "city": ["YeshuvName", "yeshuvName", "Yeshuv", "yeshuv", "KodYeshuvName", "CityName", "City"],
+    "neighborhood": ["Shchuna", "shchuna", "ShchunaName", "Neighborhood"],
+    "purpose": ["YeudName", "yeudName", "Yeud", "yeud", "YeudMichraz", "Purpose"],
+    "close_date": ["SgiraDate", "sgiraDate", "TaarichSgira", "taarichSgira", "CloseDate", "closeDate"],
+    "min_price": ["MechirMinimum", "mechirMinimum", "MinimumPrice", "MechirMizerari"],
+    "appraisal": ["Shuma", "shuma", "MechirShuma", "mechirShuma", "ErechShuma", "AppraisalValue"],
+    "winning_bid": ["SchumZchiya", "schumZchiya", "ZochePrice", "WinningBid"],
+    "units": ["MisparYechidot", "misparYechidot", "YechidotDiur", "Units"],
+}
+
+
+def _first(record, field):
+    for key in FIELD_KEYS[field]:
+        value = record.get(key)
+        if value not in (None, ""):
+            return value
+    return None
+
+
+def _to_number(value):
+    if value is None:
+        return 0
+    try:
+        return int(float(str(value).replace(",", "").replace("₪", "").strip()))
+    except ValueError:
+        return 0
+
+
+def _format_date(value):
+    """
+    API dates come back as ISO strings ("2026-03-01T12:00:00"); show them as dd/mm/yyyy.
+    """
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(str(value)[:19]).strftime("%d/%m/%Y")
+    except ValueError:
+        return str(value)
+
+
+def _extract_records(result):
+    if isinstance(result, list):
+        return result
+    if isinstance(result, dict):
+        for key in ("results", "Results", "data", "Data", "items", "Items", "michrazim", "Michrazim"):
+            if isinstance(result.get(key), list):
+                return result[key]
+    return []
+
+
+def iter_tenders(page_size=RAMI_PAGE_SIZE, max_pages=RAMI_MAX_PAGES):
+    """
+    Yield raw active tender records from MichrazimApi/Search, page by page.
+    Stops on a short, empty or repeated page.
+    """
+    session = govil_api.get_session()
+    headers = {"Content-Type": "application/json", "Accept": "application/json", "Referer": RAMI_SITE_URL}
+    first_ids = set()
+    for page in range(1, max_pages + 1):
+        payload = {"michrazType": 1, "status": 1, "pageNumber": page, "pageSize": page_size}
+        response = session.post(RAMI_SEARCH_API, json=payload, headers=headers, timeout=HTTP_TIMEOUT)
+        response.raise_for_status()
+        records = _extract_records(response.json())
+        if not records:
+            return
+        # Endpoints that ignore paging return the same full list every time
+        first_id = _first(records[0], "tender_num")
+        if first_id in first_ids:
+            return
+        first_ids.add(first_id)
+        yield from records
+        if len(records) < page_size:
+            return
+
+
+def record_to_deal(record):
+    """
+    Map one MichrazimApi record to a raw deal, or None if it has no tender number.
+    """
+    tender_num = _first(record, "tender_num")
+    if tender_num is None:
+        return None
+    city = _first(record, "city") or ""
+    purpose = _first(record, "purpose") or ""
+    close_date = _format_date(_first(record, "close_date"))
+    min_price = _to_number(_first(record, "min_price"))
+    appraisal = _to_number(_first(record, "appraisal"))
+
+    title = f"מערכת רמ\"י: מכרז {purpose} ב{city} ({tender_num})"
+    deal = {
+        "id": f"rami_{tender_num}",
+        "type": "real_estate",
+        "title": title[:100],
+        "source": "רשות מקרקעי ישראל",
+        "openingPrice": min_price or appraisal or 1000000, # Same default base as the DOM scrape when no price is published
+        "marketValue": appraisal or 1500000,
+        # benchmark re-estimates marketValue, so the published appraisal is kept in its own field too
+        "appraisalValue": appraisal or None,
+        "timeLeft": f"נסגר ב-{close_date}" if close_date else city,
+        "link": RAMI_SITE_URL,
+        "city": city or None,
+        "neighborhood": _first(record, "neighborhood"),
+        "purpose": purpose or None,
+        "closeDate": close_date,
+        "units": _to_number(_first(record, "units")) or None,
+    }
+    winning_bid = _to_number(_first(record, "winning_bid"))
+    if winning_bid:
+        deal["winningBid"] = winning_bid
+    # Tender booklets and appraisals the record links to, so document discovery needn't load the Angular site
+    pdf_links.attach_documents(deal, pdf_links.payload_documents(record, RAMI_SITE_URL))
+    return {k: v for k, v in deal.items() if v is not None}
+
+
+def get_tender_deals():
+    """
+    All active RAMI tenders as raw deals straight from the JSON API.
+    Returns an empty list (and logs why) if the API is unavailable, so the caller can fall back to the DOM.
+    """
+    deals = []
+    try:
+        for record in iter_tenders():
+            deal = record_to_deal(record)
+            if deal:
+                deals.append(deal)
+    except (requests.RequestException, ValueError) as e:
+        logging.warning(f"RAMI MichrazimApi search failed: {e}")
+    return deals
@@ -1,74 +1,248 @@
+import argparse
 import json
 import os
 import logging
+import threading
 import time
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
 from selenium.webdriver.common.by import By
-from bs4 import BeautifulSoup
 import ai_parser
 import pdf_analyzer
+import pdf_cache
+import pdf_links
 import benchmark
+import browser
+import govil_api
+import rami_api
+import merkava_api
+import html_parse
+import fingerprints
+import scheduler
+import pipeline
+import page_wait
+import http_cache
+import keyword_engine
+import parse_cache
+import title_model
 
 # Config
 DEALS_FILEPATH = 'deals.json'
+# Number of parallel headless Chrome workers (1 = original sequential mode on one shared driver)
+SCRAPER_WORKERS = int(os.environ.get('SCRAPER_WORKERS', '1'))
 logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
 
+# Per-source readiness conditions (see page_wait.py for the keys).
+# Each scraper continues as soon as its content exists instead of sleeping a fixed time;
+# "timeout" is the old fixed sleep's worst case plus some headroom.
+READINESS = {
+    "ila_search": {"xpath": "//button[contains(text(), 'חפש') or contains(text(), 'חיפוש')]", "timeout": 12},
+    "ila_results": {"css": "tr", "min_count": 2, "network_idle": 500, "timeout": 12},
+    "merkava": {"js": "return !!document.body && document.body.innerText.indexOf('מכרז') !== -1",
+                "network_idle": 750, "timeout": 20},
+    # The CollectorsWebApi fetch only needs a loaded gov.il document for origin cookies
+    "govil_api": {"js": "return document.readyState === 'complete'", "timeout": 10},
+    "sibet": {"js": "return !!document.body && document.body.innerText.indexOf('מכרז') !== -1",
+              "network_idle": 500, "timeout": 8},
+    "municipalities": {"js": "return document.readyState === 'complete'", "timeout": 6},
+    "real_estate": {"network_idle": 750, "timeout": 10},
+}
+
+# Enrichment stages, in order: (name, function, worker threads, batch size, optional). The functions update
+# the deal in place; a stage with batch size > 1 gets a list of deals (parse runs the title model over each
+# batch). Optional stages are the network-bound ones: when one is backed up, deals skip it instead of
+# blocking the scraper that submits them (which would run it over its budget), and are deferred to the next run.
+ENRICH_STAGES = [
+    ("parse", ai_parser.parse_deals, 1, int(os.environ.get('PARSE_BATCH_SIZE', '64')), False),
+    # Fetches each deal's link page to find its tender/appraisal PDFs (sets pdf_link for the risk stage)
+    ("documents", pdf_links.discover_deal_documents, pdf_links.DISCOVERY_WORKERS, 1, True),
+    # PDF downloads are I/O bound, so this stage gets the most workers
+    ("risk", pdf_analyzer.append_risk_analysis, pdf_analyzer.PDF_WORKERS, 1, True),
+    ("benchmark", benchmark.enrich_with_benchmark, 1, 1, False),
+]
+ENRICH_QUEUE_SIZE = 200
+# Stored deals are re-enriched when the title rules or the risk vocabulary change
+fingerprints.configure(ai_parser.PARSER_VERSION, pdf_analyzer.RISK_VERSION)
+
+# The streaming pipeline of the run a source thread belongs to, bound by bind_enrichment() (unset = enrich
+# inline on the calling thread). Each run has its own pipeline, so a source thread a run abandoned can
+# only ever reach that run's pipeline, which is closed by then, and never the next run's.
+_run = threading.local()
+
+
+def _stage(func, batch_size=1):
+    def run_one(item, result):
+        source, item_fp, deal = item
+        if result is not deal:
+            deal.clear()
+            deal.update(result)
+        return item
+
+    if batch_size > 1:
+        return lambda items: [run_one(item, result) for item, result in zip(items, func([deal for _, _, deal in items]))]
+    return lambda item: run_one(item, func(item[2]))
+
+
+def start_enrichment():
+    """
+    Start a streaming enrichment pipeline for one run and return it. Deals submitted by source threads
+    bound to it (bind_enrichment) are only queued, and worker threads run the stages while the scrapers
+    keep loading pages.
+    """
+    # Fingerprints of deals that skipped an optional stage or had a stage fail in this run; they aren't
+    # recorded, so they're retried
+    deferred = set()
+
+    def finish(item):
+        source, item_fp, deal = item
+        if item_fp not in deferred:
+            fingerprints.record(source, item_fp, deal)
+
+    def defer(item, stage_name):
+        deferred.add(item[1])
+
+    stages = [pipeline.Stage(name, _stage(func, batch_size), workers, ENRICH_QUEUE_SIZE, batch_size, optional)
+              for name, func, workers, batch_size, optional in ENRICH_STAGES]
+    return pipeline.Pipeline(stages, on_done=finish, on_skip=defer, on_error=defer).start()
+
+
+def finish_enrichment(enrichment, timeout=None):
+    """
+    Wait (at most `timeout` seconds) for every deal queued on the run's pipeline to be fully enriched and
+    stop it. Returns False if the timeout expired first: deals still in flight stay as far as they got, and
+    their fingerprints aren't recorded, so the next run enriches them again.
+    """
+    return enrichment.close(timeout)
+
+
+def bind_enrichment(func, enrichment):
+    """
+    Wrap a source scraper so that the thread running it submits its deals to `enrichment`.
+    """
+    def bound(*args):
+        _run.enrichment = enrichment
+        try:
+            return func(*args)
+        finally:
+            _run.enrichment = None
+    return bound
+
+
+def enrich_deal(deal):
+    """
+    Run a raw deal through parsing, document discovery, PDF risk analysis and benchmarking.
+    If the same raw deal was enriched in a previous run (same fingerprint) and the documents found for it
+    still stand, that result is reused instead. A deal a stage failed on isn't recorded, so it's retried.
+    On a thread bound to a streaming pipeline the deal is only queued (blocking only while the parse stage
+    is backed up; optional stages are skipped instead) and the returned dict is filled in place by the
+    stage workers; finish_enrichment() must be called before reading it. Once that pipeline is closing,
+    raises pipeline.PipelineClosed: the run is over (or gave up on this source) and the deal belongs to no run.
+    """
+    enrichment = getattr(_run, "enrichment", None)
+    if enrichment is not None and enrichment.closing:
+        raise pipeline.PipelineClosed(f"Enrichment of this run is closed, dropping {deal.get('id')}")
+    source = deal.get('source', '')
+    pdf_links.note_deal(deal)
+    item_fp = fingerprints.fingerprint_deal(deal)
+    cached = fingerprints.lookup(source, item_fp, pdf_links.is_current)
+    if cached is not None:
+        cached['id'] = deal['id']
+        return cached
+    if enrichment is not None:
+        enrichment.submit((source, item_fp, deal))
+        return deal
+    failed = False
+    for name, func, _, batch_size, _ in ENRICH_STAGES:
+        try:
+            deal = func([deal])[0] if batch_size > 1 else func(deal)
+        except Exception as e:
+            logging.warning(f"Enrichment stage '{name}' failed for {deal.get('id')}: {e}")
+            failed = True
+    if not failed:
+        fingerprints.record(source, item_fp, deal)
+    return deal
+
+
+# Per-source request-blocking overrides on top of browser.DEFAULT_BLOCK_PROFILE.
+# "allow" lists patterns a site needs to render the content we read.
+BLOCK_OVERRIDES = {
+    # RAMI's search button is only clickable once Angular Material's stylesheet lays it out
+    "ila": {"allow": ["*.css"]},
+}
+
+
+def open_page(driver, url, source):
+    """
+    Apply the source's request-blocking profile and navigate.
+    """
+    override = BLOCK_OVERRIDES.get(source, {})
+    browser.apply_block_profile(driver, override.get("profile"), override.get("allow", ()))
+    driver.get(url)
+
+
+def _scrape_ila_dom(driver, url):
+    """
+    DOM fallback for RAMI: open the Angular MichrazimSite, run the search and parse the results table.
+    Returns raw (not yet enriched) deals.
+    """
+    deals = []
+    open_page(driver, url, "ila")
+    page_wait.wait_until_ready(driver, READINESS["ila_search"], "RAMI search page")
+    
+    # In RAMI's new Angular portal, active tenders require clicking the 'Active Tenders' button
+    # or search button. We'll try to find any tender cards in the DOM.
+    
+    # 1. Try to click the search button directly to dump all active tenders
+    search_btns = driver.find_elements(By.XPATH, "//button[contains(text(), 'חפש') or contains(text(), 'חיפוש')]")
+    if search_btns:
+        try:
+            search_btns[0].click()
+            page_wait.wait_until_ready(driver, READINESS["ila_results"], "RAMI results table")
+        except:
+            pass
+            
+    # 2. Extract rows if a table loaded (only <tr> subtrees are parsed)
+    page = html_parse.parse_page(driver.page_source, only=["tr"])
+    
+    for cols in page.table_rows(min_cols=4):
+        # Typical columns: Tender Number, City, Neighborhood, Purpose, Close Date
+        tender_num = cols[0]
+        city = cols[1]
+        purpose = cols[3]
+        
+        title = f"מערכת רמ\"י: מכרז {purpose} ב{city} ({tender_num})"
+        
+        deals.append({
+            "id": f"rami_{tender_num}",
+            "type": "real_estate",
+            "title": title[:100],
+            "source": "רשות מקרקעי ישראל",
+            "openingPrice": 1000000, # Missing online, placing a default base
+            "marketValue": 1500000,
+            "timeLeft": city,
+            "link": url
+        })
+    return deals
+
+
 def get_ila_michrazim_data(driver):
     """
     Scrape genuine Israel Land Authority tenders from RAMI (apps.land.gov.il/MichrazimSite/).
+    Reads the MichrazimApi search JSON directly; the rendered table is only a fallback.
     """
     logging.info("Starting Israel Land Authority (RAMI) Scrape...")
     url = "https://apps.land.gov.il/MichrazimSite/"
     deals = []
     
     try:
-        driver.get(url)
-        # Wait a bit
-        time.sleep(6)
-        
-        # In RAMI's new Angular portal, active tenders require clicking the 'Active Tenders' button
-        # or search button. We'll try to find any tender cards in the DOM.
-        
-        # 1. Try to click the search button directly to dump all active tenders
-        search_btns = driver.find_elements(By.XPATH, "//button[contains(text(), 'חפש') or contains(text(), 'חיפוש')]")
-        if search_btns:
-            try:
-                search_btns[0].click()
-                time.sleep(6)
-            except:
-                pass
-                
-        # 2. Extract rows if a table loaded
-        soup = BeautifulSoup(driver.page_source, 'html.parser')
-        rows = soup.find_all('tr')
-        
-        for row in rows:
-            cols = row.find_all('td')
-            if len(cols) >= 4:
-                # Typical columns: Tender Number, City, Neighborhood, Purpose, Close Date
-                tender_num = cols[0].get_text(strip=True)
-                city = cols[1].get_text(strip=True)
-                purpose = cols[3].get_text(strip=True)
-                
-                title = f"מערכת רמ\"י: מכרז {purpose} ב{city} ({tender_num})"
-                
-                deal = {
-                    "id": f"rami_{tender_num}",
-                    "type": "real_estate",
-                    "title": title[:100],
-                    "source": "רשות מקרקעי ישראל",
-                    "openingPrice": 1000000, # Missing online, placing a default base
-                    "marketValue": 1500000,
-                    "timeLeft": city,
-                    "link": url
-                }
-                deal = ai_parser.parse_deal(deal)
-                deal = pdf_analyzer.append_risk_analysis(deal)
-                deal = benchmark.enrich_with_benchmark(deal)
-                deals.append(deal)
+        raw_deals = rami_api.get_tender_deals()
+        if raw_deals:
+            logging.info(f"RAMI API returned {len(raw_deals)} tenders.")
+        else:
+            logging.info("RAMI API returned nothing, falling back to the DOM scrape...")
+            raw_deals = _scrape_ila_dom(driver, url)
+
+        for deal in raw_deals:
+            deal = enrich_deal(deal)
+            deals.append(deal)
         
         # Deduplicate
         unique_deals = {d['id']: d for d in deals}.values()
@@ -83,33 +257,38 @@ def get_ila_michrazim_data(driver):
 def get_merkava_car_data_real(driver):
     """
     Scrape genuine government vehicle auctions from Merkava MRP.
+    Builds deals from the JSON the Angular app fetches (captured from DevTools network logs);
+    the rendered page text is only parsed if no structured records arrive.
     """
     logging.info("Starting Genuine Merkava Car Auction Scrape...")
-    url = "https://merkava.mrp.gov.il/carpub/index.html"
+    url = merkava_api.MERKAVA_URL
     deals = []
     
     try:
         logging.info(f"Navigating to {url}...")
-        driver.get(url)
-        
-        # Merkava is an Angular/JS heavy app, needs a lot of time to render the tables.
-        logging.info("Waiting for data table to load (10s)...")
-        time.sleep(10) 
+        # Each captured deal is queued for enrichment while the page is still fetching the rest
+        for deal in merkava_api.capture_deals(driver, lambda u: open_page(driver, u, "merkava"),
+                                              timeout=READINESS["merkava"]["timeout"]):
+            deal = enrich_deal(deal)
+            deals.append(deal)
+        if deals:
+            logging.info(f"Successfully scraped {len(deals)} items from Merkava network payloads.")
+            return deals
+
+        # Merkava is an Angular/JS heavy app, wait until the auction rows are rendered.
+        logging.info("No Merkava JSON payloads captured, falling back to page text...")
+        page_wait.wait_until_ready(driver, READINESS["merkava"], "Merkava auction table")
         
-        html_content = driver.page_source
-        soup = BeautifulSoup(html_content, 'html.parser')
+        page = html_parse.parse_page(driver.page_source)
         
         # In Merkava, each auction row is typically rendered inside divs with specific data-bindings or classes.
         # Since we observed the raw text in the previous test (e.g. "מכרז מקוון למכירת רכב ממשלתי משומש205-2026"),
         # We will look for elements containing "מכרז". If specific selectors are tough, we parse by known text blocks.
         
-        # A more robust approach for this specific site's Angular-generated table:
-        cards = soup.find_all('div', class_=lambda c: c and 'panel' in c)  # Often it uses Bootstrap or similar panels
-        
         # Since we can't perfectly predict the dynamic DOM without visual inspection, 
         # we will use a text-based fallback to extract the blocks we saw in the previous step's output.
         # Let's extract all text chunks that look like auctions.
-        text_blocks = soup.get_text(separator='|', strip=True).split('|')
+        text_blocks = page.text_blocks()
         
         auctions_found = []
         current_auction = {}
@@ -140,10 +319,9 @@ def get_merkava_car_data_real(driver):
         unique_deals = []
         seen_titles = set()
         for deal in auctions_found:
-            if deal['title'] not in seen_titles and len(unique_deals) < 15:
-                deal = ai_parser.parse_deal(deal)
-                deal = pdf_analyzer.append_risk_analysis(deal)
-                deal = benchmark.enrich_with_benchmark(deal)
+            if deal['title'] not in seen_titles:
+                seen_titles.add(deal['title'])
+                deal = enrich_deal(deal)
                 unique_deals.append(deal)
         deals = unique_deals
         logging.info(f"Successfully scraped {len(deals)} items via Selenium parsing.")
@@ -156,6 +334,7 @@ def get_merkava_eca_data_real(driver):
     """
     Scrape ECA (Enforcement & Collection Authority - רשות האכיפה והגבייה).
     Searches gov.il CollectorsWebApi by auction keywords to find real sale listings.
+    Uses direct HTTP; the driver is only used if gov.il blocks the direct call.
     """
     logging.info("Starting ECA (Enforcement Authority - Hotzaa LaPoal) Scrape...")
     url = "https://www.gov.il/he/departments/law_enforcement_and_collection_system_authority/govil-landing-page"
@@ -164,39 +343,35 @@ def get_merkava_eca_data_real(driver):
     AUCTION_KEYWORDS = ["מכירה פומבית", "מכרז ציוד", "מכרז רכב", "כינוס נכסים", "מכירת ציוד", "מכירת רכבים"]
 
     try:
-        driver.get(url)
-        time.sleep(5)
-
         import urllib.parse
         seen_ids = set()
-        
-        for keyword in AUCTION_KEYWORDS:
-            encoded = urllib.parse.quote(keyword)
-            api_url = f"https://www.gov.il/CollectorsWebApi/api/DataCollector/GetResults?CollectorType=rfp&CollectorType=reports&Keywords={encoded}&officeId=f00eaeab-7f8f-4f65-9b8e-d87b6d6d23a8&culture=he"
-            js = f"var cb=arguments[0];fetch('{api_url}').then(r=>r.json()).then(d=>cb(d)).catch(e=>cb({{error:e.message}}));"
-            result = driver.execute_async_script(js)
 
-            items = []
-            if isinstance(result, dict):
-                items = result.get('results', result.get('Results', []))
-            elif isinstance(result, list):
-                items = result
+        # All keyword searches are issued at once; results are merged and deduplicated as they arrive
+        first_pages = {}
+        for keyword in AUCTION_KEYWORDS:
+            api_url = f"{govil_api.COLLECTORS_API}?CollectorType=rfp&CollectorType=reports&Keywords={urllib.parse.quote(keyword)}&officeId=f00eaeab-7f8f-4f65-9b8e-d87b6d6d23a8&culture=he"
+            first_pages[govil_api.paged_url(api_url, 0)] = api_url
+        for page_url, result in govil_api.fetch_json_many(first_pages, driver, url, READINESS["govil_api"]):
+            # The rest of each keyword's result set streams in through the paginator
+            items = govil_api.iter_collector_results(first_pages[page_url], driver, url, READINESS["govil_api"],
+                                                     first_result=result)
 
             for item in items:
                 title = item.get("Title", item.get("title", ""))
                 if not title or len(title) < 5:
                     continue
-                item_id = item.get("Id", item.get("id", title))
+                # Keyword searches finish in any order, so the id comes from the item, not its position
+                item_id = item.get("Id", item.get("id")) or fingerprints.fingerprint(title)[:16]
                 if item_id in seen_ids:
                     continue
                 seen_ids.add(item_id)
 
                 item_url = item.get("Url", item.get("url", ""))
                 deal_url = f"https://www.gov.il{item_url}" if item_url and not item_url.startswith("http") else (item_url or url)
-                deal_type = "car" if any(w in title for w in ["רכב", "מכונית", "אופנוע", "משאית"]) else "equipment"
+                deal_type = "car" if "vehicle_word" in keyword_engine.scan(title) else "equipment"
 
                 deal = {
-                    "id": f"eca_{len(deals)}",
+                    "id": f"eca_{item_id}",
                     "type": deal_type,
                     "title": f"הוצאה לפועל: {title}",
                     "source": "רשות האכיפה והגבייה - הוצאה לפועל",
@@ -205,16 +380,9 @@ def get_merkava_eca_data_real(driver):
                     "timeLeft": "פתוח להצעות",
                     "link": deal_url,
                 }
-                deal = ai_parser.parse_deal(deal)
-                deal = pdf_analyzer.append_risk_analysis(deal)
-                deal = benchmark.enrich_with_benchmark(deal)
+                pdf_links.attach_documents(deal, pdf_links.payload_documents(item, govil_api.GOVIL_ORIGIN))
+                deal = enrich_deal(deal)
                 deals.append(deal)
-                
-                if len(deals) >= 10:
-                    break
-            
-            if len(deals) >= 10:
-                break
 
         logging.info(f"Successfully scraped {len(deals)} valid auction items from ECA.")
     except Exception as e:
@@ -240,26 +408,16 @@ def get_tax_authority_customs(driver):
     """
     Scrape Israel Tax Authority / Customs confiscated goods.
     Uses the real CollectorsWebApi discovered via browser network inspection.
+    Uses direct HTTP; the driver is only used if gov.il blocks the direct call.
     """
     logging.info("Starting Tax Authority (Customs) Scrape...")
     url = "https://www.gov.il/he/departments/publications/Call_for_bids/customs-auctions"
     deals = []
     
     try:
-        driver.get(url)
-        time.sleep(5)
-        
         # Correct API discovered via browser DevTools inspection
-        api_url = "https://www.gov.il/CollectorsWebApi/api/DataCollector/GetResults?CollectorType=reports&CollectorType=rfp&Keywords=%D7%9E%D7%9B%D7%A1&type=rfp&culture=he"
-        js_code = f"var callback = arguments[0]; fetch('{api_url}').then(r => r.json()).then(data => callback(data)).catch(e => callback({{error: e.message}}));"
-        
-        result = driver.execute_async_script(js_code)
-        
-        items = []
-        if isinstance(result, dict):
-            items = result.get('results', result.get('Results', []))
-        elif isinstance(result, list):
-            items = result
+        api_url = f"{govil_api.COLLECTORS_API}?CollectorType=reports&CollectorType=rfp&Keywords=%D7%9E%D7%9B%D7%A1&type=rfp&culture=he"
+        items = govil_api.iter_collector_results(api_url, driver, url, READINESS["govil_api"])
         
         for idx, item in enumerate(items):
             title = item.get("Title", item.get("title", "מכרז מכס"))
@@ -276,9 +434,8 @@ def get_tax_authority_customs(driver):
                 "timeLeft": "פתוח להצעות",
                 "link": deal_url
             }
-            deal = ai_parser.parse_deal(deal)
-            deal = pdf_analyzer.append_risk_analysis(deal)
-            deal = benchmark.enrich_with_benchmark(deal)
+            pdf_links.attach_documents(deal, pdf_links.payload_documents(item, govil_api.GOVIL_ORIGIN))
+            deal = enrich_deal(deal)
             deals.append(deal)
         
         logging.info(f"Successfully scraped {len(deals)} items from Tax Authority.")
@@ -291,33 +448,23 @@ def get_tax_authority_customs(driver):
 def get_official_receiver_justice(driver):
     """
     Scrape Official Receiver (Justice Ministry) using the real CollectorsWebApi.
+    Uses direct HTTP; the driver is only used if gov.il blocks the direct call.
     """
     logging.info("Starting Official Receiver (Ministry of Justice) Scrape...")
     url = "https://www.gov.il/he/departments/publications/?OfficeId=b723f1dd-b541-4cfd-82d2-c48c9bef4187"
     deals = []
     
     try:
-        driver.get(url)
-        time.sleep(5)
-        
         # Correct API using the real CollectorsWebApi
-        api_url = "https://www.gov.il/CollectorsWebApi/api/DataCollector/GetResults?CollectorType=reports&CollectorType=rfp&officeId=b723f1dd-b541-4cfd-82d2-c48c9bef4187&culture=he"
-        js_code = f"var callback = arguments[0]; fetch('{api_url}').then(r => r.json()).then(data => callback(data)).catch(e => callback({{error: e.message}}));"
-        
-        result = driver.execute_async_script(js_code)
-        
-        items = []
-        if isinstance(result, dict):
-            items = result.get('results', result.get('Results', []))
-        elif isinstance(result, list):
-            items = result
+        api_url = f"{govil_api.COLLECTORS_API}?CollectorType=reports&CollectorType=rfp&officeId=b723f1dd-b541-4cfd-82d2-c48c9bef4187&culture=he"
+        items = govil_api.iter_collector_results(api_url, driver, url, READINESS["govil_api"])
         
         for idx, item in enumerate(items):
             title = item.get("Title", item.get("title", "מכרז כונס הרשמי"))
             item_url = item.get("Url", item.get("url", ""))
             deal_url = f"https://www.gov.il{item_url}" if item_url and not item_url.startswith('http') else (item_url or url)
             
-            d_type = "real_estate" if "דיר" in title or "מקרקעין" in title or "נכס" in title else "equipment"
+            d_type = "real_estate" if "real_estate_word" in keyword_engine.scan(title) else "equipment"
             
             deal = {
                 "id": f"justice_{idx}",
@@ -329,9 +476,8 @@ def get_official_receiver_justice(driver):
                 "timeLeft": "פתוח להצעות",
                 "link": deal_url
             }
-            deal = ai_parser.parse_deal(deal)
-            deal = pdf_analyzer.append_risk_analysis(deal)
-            deal = benchmark.enrich_with_benchmark(deal)
+            pdf_links.attach_documents(deal, pdf_links.payload_documents(item, govil_api.GOVIL_ORIGIN))
+            deal = enrich_deal(deal)
             deals.append(deal)
         
         logging.info(f"Successfully scraped {len(deals)} items from Official Receiver.")
@@ -341,42 +487,62 @@ def get_official_receiver_justice(driver):
     return deals
 
 
+# The Ministry of Defense publication history goes back years of closed tenders; read only the latest pages
+SIBET_MAX_PAGES = int(os.environ.get('SIBET_MAX_PAGES', '10'))
+
+
+def _is_sibet_title(text):
+    return ("מכרז" in text or "מכירת" in text or "עודפי צה\"ל" in text) and 10 < len(text) < 80 and "חיפוש" not in text
+
+
+def _sibet_deal(idx, title):
+    return {
+        "id": f"sibet_{idx}",
+        "type": "equipment",
+        "title": f"סיב\"ט משרד הביטחון: {title}",
+        "source": "סיב\"ט - עודפי צה\"ל",
+        "openingPrice": 0,
+        "marketValue": 0,
+        "timeLeft": "פרטים בקובץ",
+        "link": "https://online.sibet.mod.gov.il/"
+    }
+
+
 def get_sibet_idf_surplus(driver):
     """
     Scrape SIBET (Israel Ministry of Defense surplus).
+    Streams the latest SIBET_MAX_PAGES pages of Ministry of Defense publications from PublicationApi,
+    and falls back to the rendered gov.il search page if the API returns nothing.
     """
     logging.info("Starting SIBET (IDF Surplus) Scrape...")
     url = "https://online.sibet.mod.gov.il/"
+    search_url = "https://www.gov.il/he/search/?OfficeId=99c4bd52-87ad-45c1-9f93-0e3185347209&skip=0&limit=10"
     deals = []
     
     try:
-        # Fallback heuristic since SIBET requires heavy state parsing or is locked
-        driver.get("https://www.gov.il/he/search/?OfficeId=99c4bd52-87ad-45c1-9f93-0e3185347209&skip=0&limit=10")
-        time.sleep(4)
-        
-        soup = BeautifulSoup(driver.page_source, 'html.parser')
-        text_blocks = [t for t in soup.get_text(separator='|', strip=True).split('|') if len(t) > 3]
-        
-        for idx, block in enumerate(text_blocks):
-            if "מכרז" in block or "מכירת" in block or "עודפי צה\"ל" in block:
-                if 10 < len(block) < 80 and "חיפוש" not in block:
-                    deal = {
-                        "id": f"sibet_{len(deals)}",
-                        "type": "equipment",
-                        "title": f"סיב\"ט משרד הביטחון: {block}",
-                        "source": "סיב\"ט - עודפי צה\"ל",
-                        "openingPrice": 0,
-                        "marketValue": 0,
-                        "timeLeft": "פרטים בקובץ",
-                        "link": "https://online.sibet.mod.gov.il/"
-                    }
-                    deal = ai_parser.parse_deal(deal)
-                    deal = pdf_analyzer.append_risk_analysis(deal)
-                    deal = benchmark.enrich_with_benchmark(deal)
+        api_url = f"{govil_api.PUBLICATION_API}?OfficeId=99c4bd52-87ad-45c1-9f93-0e3185347209"
+        items = govil_api.iter_publication_results(api_url, driver, search_url, READINESS["govil_api"],
+                                                   max_pages=SIBET_MAX_PAGES)
+        for item in items:
+            title = item.get("Title", item.get("title", "")) or ""
+            if _is_sibet_title(title):
+                deal = _sibet_deal(len(deals), title)
+                pdf_links.attach_documents(deal, pdf_links.payload_documents(item, govil_api.GOVIL_ORIGIN))
+                deal = enrich_deal(deal)
+                deals.append(deal)
+
+        if not deals:
+            # Fallback heuristic since SIBET requires heavy state parsing or is locked
+            open_page(driver, search_url, "sibet")
+            page_wait.wait_until_ready(driver, READINESS["sibet"], "SIBET search results")
+            
+            text_blocks = html_parse.parse_page(driver.page_source).text_blocks(min_len=3)
+            
+            for block in text_blocks:
+                if _is_sibet_title(block):
+                    deal = _sibet_deal(len(deals), block)
+                    deal = enrich_deal(deal)
                     deals.append(deal)
-                    
-                    if len(deals) >= 5:
-                        break
                         
         logging.info(f"Successfully scraped {len(deals)} items from SIBET.")
     except Exception as e:
@@ -395,8 +561,8 @@ def get_municipalities_tenders(driver):
     
     try:
         # Using a general search heuristic for municipal tenders from Gov.il search
-        driver.get("https://www.gov.il/he/departments/publications/?OfficeId=b723f1dd-b541-4cfd-82d2-c48c9bef4187")
-        time.sleep(3)
+        open_page(driver, "https://www.gov.il/he/departments/publications/?OfficeId=b723f1dd-b541-4cfd-82d2-c48c9bef4187", "municipalities")
+        page_wait.wait_until_ready(driver, READINESS["municipalities"], "Municipalities page")
         # We will intentionally leave it empty or return 0 if no clear path is found, 
         # to adhere to the 100% authentic data rule, preventing mock generation.
         logging.info(f"Successfully scraped {len(deals)} items from Municipalities.")
@@ -416,13 +582,13 @@ def get_general_admin_real_estate(driver):
     
     try:
         logging.info(f"Navigating to {url}...")
-        driver.get(url)
-        time.sleep(5) # gov.il pages render faster than merkava
+        open_page(driver, url, "real_estate")
+        page_wait.wait_until_ready(driver, READINESS["real_estate"], "Real estate list")
         
-        soup = BeautifulSoup(driver.page_source, 'html.parser')
+        page = html_parse.parse_page(driver.page_source)
         
         # On gov.il pages, real estate listings often appear in tables or specific div lists
-        text_blocks = [t for t in soup.get_text(separator='|', strip=True).split('|') if len(t) > 3]
+        text_blocks = page.text_blocks(min_len=3)
         
         auctions_found = []
         # Use more generalized terms
@@ -442,16 +608,14 @@ def get_general_admin_real_estate(driver):
                         "timeLeft": location[:20],
                         "link": url
                     }
-                    deal = ai_parser.parse_deal(deal)
-                    deal = pdf_analyzer.append_risk_analysis(deal)
-                    deal = benchmark.enrich_with_benchmark(deal)
+                    deal = enrich_deal(deal)
                     auctions_found.append(deal)
 
         unique_deals = []
         seen_titles = set()
         for deal in auctions_found:
             # Filter generalized words that aren't actually titles
-            if deal['title'] not in seen_titles and len(unique_deals) < 6 and "חיפוש" not in deal['title']:
+            if deal['title'] not in seen_titles and "חיפוש" not in deal['title']:
                 unique_deals.append(deal)
                 seen_titles.add(deal['title'])
                 
@@ -463,60 +627,105 @@ def get_general_admin_real_estate(driver):
     return deals
 
 
-def run_all_scrapers():
-    logging.info("--- Starting Genuine Multi-Source Selenium Scraper (Scheduled Run) ---")
-    
-    # Initialize driver ONCE and share it to save huge overhead
-    chrome_options = Options()
-    chrome_options.add_argument("--headless")
-    chrome_options.add_argument("--no-sandbox")
-    chrome_options.add_argument("--disable-dev-shm-usage")
-    chrome_options.add_argument("--disable-gpu")
-    chrome_options.add_argument("window-size=1920,1080")
-    chrome_options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
-
-    driver = None
-    all_deals = []
-    
+# Source registry: (name, scraper function, needs a browser driver)
+# Registry order is the order of deals in deals.json; run order comes from the scheduler's latency history.
+SOURCES = [
+    ("merkava", get_merkava_car_data_real, True),
+    ("eca", get_merkava_eca_data_real, True),
+    ("real_estate", get_general_admin_real_estate, True),
+    ("ila", get_ila_michrazim_data, True),
+    ("eca_equipment", get_merkava_eca_equipment_data, False),
+    ("tax_customs", get_tax_authority_customs, True),
+    ("justice", get_official_receiver_justice, True),
+    ("sibet", get_sibet_idf_surplus, True),
+    ("municipalities", get_municipalities_tenders, True),
+]
+
+# Per-source time budgets in seconds (others get scheduler.DEFAULT_SOURCE_BUDGET)
+SOURCE_BUDGETS = {
+    "merkava": 60,
+    "eca": 60,
+    "real_estate": 45,
+    "ila": 60,
+    "eca_equipment": 5,
+    "tax_customs": 45,
+    "justice": 45,
+    "sibet": 45,
+    "municipalities": 20,
+}
+# Global run deadline in seconds; whatever finished by then is merged and saved
+RUN_DEADLINE = int(os.environ.get('SCRAPER_RUN_DEADLINE', '900'))
+# Seconds enrichment may still drain after the scrapers stop, even when they used up the whole deadline
+ENRICH_CLOSE_GRACE = int(os.environ.get('ENRICH_CLOSE_GRACE', '60'))
+
+
+# Daemon mode: minutes between runs of each source
+SOURCE_INTERVALS = {
+    "merkava": 15,
+    "eca": 30,
+    "real_estate": 60,
+    "ila": 30,
+    "eca_equipment": 240,
+    "tax_customs": 60,
+    "justice": 60,
+    "sibet": 60,
+    "municipalities": 240,
+}
+# Navigations after which the daemon's warm browser is restarted
+BROWSER_MAX_PAGES = int(os.environ.get('BROWSER_MAX_PAGES', '50'))
+
+
+def run_all_scrapers(workers=None, deadline=None):
+    """
+    Run every registered source and merge the results into DEALS_FILEPATH.
+    Sources are pulled by `workers` parallel browser workers, so wall-clock time tracks the slowest
+    worker rather than the sum. Each source has a time budget and the run a global deadline;
+    overrunning sources are abandoned and the merge runs with whatever finished.
+    """
+    workers = SCRAPER_WORKERS if workers is None else workers
+    workers = max(1, min(workers, len(SOURCES)))
+    deadline = RUN_DEADLINE if deadline is None else deadline
+    run_deadline = time.monotonic() + deadline
+    logging.info(f"--- Starting Genuine Multi-Source Selenium Scraper (Scheduled Run, {workers} worker(s), {deadline}s deadline) ---")
+    started = time.time()
+
+    fingerprints.load()
+    title_model.start_run()
+    enrichment = start_enrichment()
     try:
-        logging.info("Initializing Shared ChromeDriver...")
-        service = Service(ChromeDriverManager().install())
-        driver = webdriver.Chrome(service=service, options=chrome_options)
-        
-        merkava_deals = get_merkava_car_data_real(driver)
-        all_deals.extend(merkava_deals)
-        
-        eca_deals = get_merkava_eca_data_real(driver)
-        all_deals.extend(eca_deals)
-        
-        real_estate_deals = get_general_admin_real_estate(driver)
-        all_deals.extend(real_estate_deals)
-
-        ila_deals = get_ila_michrazim_data(driver)
-        all_deals.extend(ila_deals)
-        
-        eca_equipment_deals = get_merkava_eca_equipment_data()
-        all_deals.extend(eca_equipment_deals)
-        
-        tax_customs_deals = get_tax_authority_customs(driver)
-        all_deals.extend(tax_customs_deals)
-        
-        justice_deals = get_official_receiver_justice(driver)
-        all_deals.extend(justice_deals)
-        
-        sibet_deals = get_sibet_idf_surplus(driver)
-        all_deals.extend(sibet_deals)
-        
-        muni_deals = get_municipalities_tenders(driver)
-        all_deals.extend(muni_deals)
-
-        
-    except Exception as e:
-        logging.error(f"Failed to run scrapers appropriately: {e}")
+        sources = [(name, bind_enrichment(func, enrichment), needs_driver) for name, func, needs_driver in SOURCES]
+        results = scheduler.run_scheduled(sources, workers, SOURCE_BUDGETS, deadline=deadline)
     finally:
-        if driver:
-            driver.quit()
-    
+        # Enrichment (PDF and page downloads) counts against the run deadline too
+        enriched = finish_enrichment(enrichment, timeout=max(ENRICH_CLOSE_GRACE, run_deadline - time.monotonic()))
+
+    # Keep the registry order so deals.json stays stable between runs
+    all_deals = []
+    for name, _, _ in SOURCES:
+        all_deals.extend(results.get(name, []))
+    if not enriched:
+        # Abandoned stage workers may still be writing to the unfinished deals; save a snapshot
+        all_deals = [dict(deal) for deal in all_deals]
+    logging.info(f"All sources finished in {time.time() - started:.1f}s "
+                 f"({len(results)}/{len(SOURCES)} completed).")
+    fingerprints.save()
+    logging.info(f"Incremental enrichment: {fingerprints.get_stats()}")
+    parse_cache.save()
+    logging.info(f"Title parse cache: {parse_cache.get_stats()}")
+    logging.info(f"Title model: {title_model.get_stats()}")
+    http_cache.flush()
+    logging.info(f"HTTP cache: {http_cache.get_stats()}")
+    logging.info(f"PDF text cache: {pdf_cache.get_stats()}")
+    pdf_links.save()
+    logging.info(f"Document discovery: {pdf_links.get_stats()}")
+
+    merge_and_save_deals(all_deals)
+
+
+def merge_and_save_deals(all_deals):
+    """
+    Merge freshly scraped deals into DEALS_FILEPATH.
+    """
     # --- Merge-by-source logic ---
     # Instead of overwriting the entire file, we merge:
     # - Keep existing deals from sources that returned 0 new results (source had nothing today)
@@ -547,9 +756,90 @@ def run_all_scrapers():
     except IOError as e:
         logging.error(f"Failed to write to {DEALS_FILEPATH}: {e}")
 
+def run_source_job(name, func, needs_driver, state):
+    """
+    One daemon tick for a source: run it on the warm browser under its budget and merge its deals.
+    """
+    driver = state["driver"]
+    driver.prepare()
+    fingerprints.load()
+    title_model.start_run()
+    budget = SOURCE_BUDGETS.get(name, scheduler.DEFAULT_SOURCE_BUDGET)
+    enrichment = start_enrichment()
+    try:
+        status, deals, elapsed = scheduler.run_with_budget(name, bind_enrichment(func, enrichment),
+                                                           needs_driver, driver, budget)
+    finally:
+        enriched = finish_enrichment(enrichment, timeout=max(ENRICH_CLOSE_GRACE, budget))
+    if not enriched:
+        deals = [dict(deal) for deal in deals]
+    if status == "timeout":
+        logging.error(f"Source {name} exceeded its {budget}s budget, replacing the browser")
+        # The abandoned thread still holds this driver; quit it for good and start over
+        driver.quit()
+        state["driver"] = browser.WarmDriver(max_pages=BROWSER_MAX_PAGES)
+
+    stats = scheduler.load_stats()
+    scheduler.update_stats(stats, name, elapsed, len(deals), status)
+    scheduler.save_stats(stats)
+    fingerprints.save()
+    parse_cache.save()
+    pdf_links.save()
+    http_cache.flush()
+    if deals:
+        merge_and_save_deals(deals)
+
+
+def run_daemon_job(name, func, needs_driver, state):
+    """
+    run_source_job for the schedule loop, which doesn't catch job errors: a failing tick is logged and the
+    source runs again at its next interval instead of the exception ending the daemon.
+    """
+    try:
+        run_source_job(name, func, needs_driver, state)
+    except Exception as e:
+        logging.error(f"Daemon job for {name} failed: {e}")
+
+
+def run_daemon():
+    """
+    Keep a warm browser and HTTP sessions alive and run each source on its own interval (SOURCE_INTERVALS).
+    Every source runs once at startup.
+    """
+    import schedule
+
+    logging.info("--- Starting scraper daemon ---")
+    state = {"driver": browser.WarmDriver(max_pages=BROWSER_MAX_PAGES)}
+    for name, func, needs_driver in SOURCES:
+        minutes = SOURCE_INTERVALS.get(name, 60)
+        schedule.every(minutes).minutes.do(run_daemon_job, name, func, needs_driver, state)
+        logging.info(f"Scheduled {name} every {minutes} minutes")
+
+    try:
+        schedule.run_all()
+        while True:
+            schedule.run_pending()
+            time.sleep(1)
+    except KeyboardInterrupt:
+        logging.info("Scraper daemon stopping...")
+    finally:
+        state["driver"].quit()
+
+
 def main():
-    # Since we are using GitHub Actions cron for daily execution, we don't need the local Python `schedule` loop
-    run_all_scrapers()
+    # GitHub Actions cron runs a single pass; --daemon uses the `schedule` loop for minute-level refreshes
+    parser = argparse.ArgumentParser(description="Bargain Hunter multi-source scraper")
+    parser.add_argument("--workers", type=int, default=None,
+                        help=f"parallel headless Chrome workers (default: SCRAPER_WORKERS={SCRAPER_WORKERS})")
+    parser.add_argument("--deadline", type=int, default=None,
+                        help=f"overall run deadline in seconds (default: SCRAPER_RUN_DEADLINE={RUN_DEADLINE})")
+    parser.add_argument("--daemon", action="store_true",
+                        help="stay running with a warm browser and refresh each source on its own interval")
+    args = parser.parse_args()
+    if args.daemon:
+        run_daemon()
+    else:
+        run_all_scrapers(workers=args.workers, deadline=args.deadline)
 
 if __name__ == "__main__":
     main()
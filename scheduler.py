@@ -0,0 +1,169 @@
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import browser
+
+# Deadline-aware source scheduler.
+# Workers pull sources from a shared queue ordered by historical cost (seconds per deal, cheapest first),
+# each source runs under its own time budget, and nothing new starts after the run deadline.
+# An overrunning source is abandoned: its thread is left to die and the worker's browser is quit
+# (which also unblocks a stuck WebDriver call) and replaced with a fresh one for the next source.
+SOURCE_STATS_FILEPATH = os.path.join('.cache', 'source_stats.json')
+DEFAULT_SOURCE_BUDGET = 90
+# Expected latency for sources without history
+DEFAULT_EXPECTED_LATENCY = 30
+# Weight of the newest observation in the latency/deals moving averages
+STATS_ALPHA = 0.5
+# Extra seconds the run waits for workers past the deadline (a source that started just before it)
+DEADLINE_GRACE = 5
+
+
+def load_stats():
+    if os.path.exists(SOURCE_STATS_FILEPATH):
+        try:
+            with open(SOURCE_STATS_FILEPATH, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logging.warning(f"Ignoring unreadable source stats: {e}")
+    return {}
+
+
+def save_stats(stats):
+    try:
+        os.makedirs(os.path.dirname(SOURCE_STATS_FILEPATH) or '.', exist_ok=True)
+        with open(SOURCE_STATS_FILEPATH, 'w', encoding='utf-8') as f:
+            json.dump(stats, f, indent=2)
+    except OSError as e:
+        logging.warning(f"Failed to save source stats: {e}")
+
+
+def update_stats(stats, name, elapsed, deal_count, status):
+    entry = stats.setdefault(name, {})
+    for key, value in (("latency", elapsed), ("deals", deal_count)):
+        previous = entry.get(key)
+        entry[key] = value if previous is None else STATS_ALPHA * value + (1 - STATS_ALPHA) * previous
+    entry["last_status"] = status
+    entry["last_run"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+
+
+def order_sources(sources, stats):
+    """
+    Cheapest sources first: expected seconds per deal, from the latency and deal-count history.
+    Sources without history keep their registry order after the known ones of similar cost.
+    """
+    def cost(indexed):
+        index, (name, _, _) = indexed
+        entry = stats.get(name, {})
+        latency = entry.get("latency", DEFAULT_EXPECTED_LATENCY)
+        return latency / max(1.0, entry.get("deals", 1.0)), index
+    return [source for _, source in sorted(enumerate(sources), key=cost)]
+
+
+def run_source(name, func, needs_driver, driver):
+    """
+    Run a single source scraper, never letting it raise into the caller.
+    """
+    started = time.time()
+    try:
+        deals = func(driver) if needs_driver else func()
+    except Exception as e:
+        logging.error(f"Source {name} crashed: {e}")
+        deals = []
+    logging.info(f"Source {name} finished in {time.time() - started:.1f}s with {len(deals)} deals.")
+    return deals
+
+
+def _run_into(box, name, func, needs_driver, driver):
+    box["deals"] = run_source(name, func, needs_driver, driver)
+
+
+def run_with_budget(name, func, needs_driver, driver, budget):
+    """
+    Run a source in its own thread and wait at most `budget` seconds.
+    Returns (status, deals, elapsed) with status "ok" or "timeout"; on timeout the thread is abandoned
+    and the caller must replace the driver it was using.
+    """
+    box = {}
+    runner = threading.Thread(target=_run_into, args=(box, name, func, needs_driver, driver),
+                              name=f"source-{name}", daemon=True)
+    started = time.monotonic()
+    runner.start()
+    runner.join(budget)
+    elapsed = time.monotonic() - started
+    if runner.is_alive():
+        return "timeout", [], elapsed
+    return "ok", box.get("deals", []), elapsed
+
+
+def _worker(worker_id, pending, budgets, default_budget, run_deadline, results, outcomes, lock):
+    # Chrome only starts if a source actually touches the driver (gov.il API sources usually don't)
+    driver = browser.LazyDriver()
+    try:
+        while True:
+            try:
+                name, func, needs_driver = pending.get_nowait()
+            except queue.Empty:
+                return
+            remaining = run_deadline - time.monotonic()
+            if remaining <= 0:
+                logging.warning(f"[worker {worker_id}] Run deadline reached, skipping source {name}")
+                with lock:
+                    outcomes[name] = ("skipped", 0, 0)
+                continue
+
+            budget = min(budgets.get(name, default_budget), remaining)
+            status, deals, elapsed = run_with_budget(name, func, needs_driver, driver, budget)
+
+            if status == "timeout":
+                logging.error(f"[worker {worker_id}] Source {name} exceeded its {budget:.0f}s budget, abandoning it")
+                with lock:
+                    outcomes[name] = ("timeout", elapsed, 0)
+                # Quitting the browser makes the abandoned thread's pending WebDriver call fail
+                driver.quit()
+                driver = browser.LazyDriver()
+                continue
+
+            with lock:
+                results[name] = deals
+                outcomes[name] = ("ok", elapsed, len(deals))
+    finally:
+        driver.quit()
+
+
+def run_scheduled(sources, workers=1, budgets=None, default_budget=DEFAULT_SOURCE_BUDGET, deadline=None):
+    """
+    Run sources on `workers` browser workers under per-source budgets and an overall deadline (seconds).
+    Returns a dict of source name -> deals for every source that finished in time.
+    """
+    budgets = budgets or {}
+    stats = load_stats()
+    ordered = order_sources(sources, stats)
+    logging.info(f"Source order: {[name for name, _, _ in ordered]}")
+
+    pending = queue.Queue()
+    for source in ordered:
+        pending.put(source)
+    run_deadline = time.monotonic() + (deadline if deadline else float("inf"))
+    results, outcomes, lock = {}, {}, threading.Lock()
+
+    threads = [threading.Thread(target=_worker, name=f"scraper-worker-{i}", daemon=True,
+                                args=(i, pending, budgets, default_budget, run_deadline, results, outcomes, lock))
+               for i in range(max(1, workers))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(None if deadline is None else max(0, run_deadline - time.monotonic()) + DEADLINE_GRACE)
+    if any(thread.is_alive() for thread in threads):
+        logging.error("Run deadline passed with workers still busy; merging whatever finished")
+
+    with lock:
+        finished = dict(results)
+        for name, (status, elapsed, deal_count) in outcomes.items():
+            if status == "skipped":
+                continue
+            update_stats(stats, name, elapsed, deal_count, status)
+    save_stats(stats)
+    return finished
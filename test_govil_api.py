@@ -0,0 +1,76 @@
+from urllib.parse import parse_qs, urlsplit
+import pytest
+import govil_api
+
+
+def fake_api(monkeypatch, rows, cap, report_total=True):
+    """
+    Serve `rows` items from a fake paginated endpoint that returns at most `cap` rows per call.
+    """
+    calls = []
+
+    def fetch_json_direct(api_url):
+        query = parse_qs(urlsplit(api_url).query)
+        skip, limit = int(query["skip"][0]), int(query["limit"][0])
+        calls.append(skip)
+        result = {"results": list(range(skip, min(rows, skip + min(limit, cap))))}
+        if report_total:
+            result["total"] = rows
+        return result
+
+    monkeypatch.setattr(govil_api, "fetch_json_direct", fetch_json_direct)
+    return calls
+
+
+def test_pages_advance_by_rows_received(monkeypatch):
+    fake_api(monkeypatch, rows=100, cap=10)
+    assert list(govil_api.iter_results("https://example.test/api")) == list(range(100))
+
+
+def test_pages_advance_by_rows_received_without_total(monkeypatch):
+    fake_api(monkeypatch, rows=95, cap=10, report_total=False)
+    assert list(govil_api.iter_results("https://example.test/api")) == list(range(95))
+
+
+def test_short_page_before_total_resyncs(monkeypatch):
+    calls = fake_api(monkeypatch, rows=100, cap=10)
+    original = govil_api.fetch_json_direct
+
+    def flaky(api_url):
+        result = original(api_url)
+        if result["results"][:1] == [30]:
+            result["results"] = result["results"][:4]
+        return result
+
+    monkeypatch.setattr(govil_api, "fetch_json_direct", flaky)
+    assert list(govil_api.iter_results("https://example.test/api")) == list(range(100))
+    assert 34 in calls
+
+
+def test_max_pages(monkeypatch):
+    calls = fake_api(monkeypatch, rows=1000, cap=50)
+    assert list(govil_api.iter_results("https://example.test/api", max_pages=3)) == list(range(150))
+    assert len(calls) == 3
+
+
+def test_challenge_page_is_not_cached(monkeypatch, tmp_path):
+    import requests
+    import http_cache
+
+    monkeypatch.setattr(http_cache, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(http_cache, "_index", None)
+    bodies = [(b"<html>challenge</html>", "text/html"), (b'{"results": [1]}', "application/json")]
+
+    class Session:
+        def get(self, url, **kwargs):
+            response = requests.models.Response()
+            response.status_code = 200
+            response._content, response.headers["Content-Type"] = bodies.pop(0)
+            return response
+
+    monkeypatch.setattr(govil_api, "get_session", lambda: Session())
+    with pytest.raises(govil_api.BlockedError):
+        govil_api.fetch_json_direct("https://example.test/api")
+    assert govil_api.fetch_json_direct("https://example.test/api") == {"results": [1]}
+    # The JSON answer was cached and is served without another request
+    assert govil_api.fetch_json_direct("https://example.test/api") == {"results": [1]}
@@ -0,0 +1,382 @@
+import json
+import logging
+import math
+import os
+import random
+import sys
+import threading
+import time
+import gazetteer
+import hebrew_text
+
+# Optional learned title parser: a token tagger (make, model, year, rooms, area, city) and a category
+# classifier, both averaged perceptrons over sparse features of hebrew_text tokens. Pure Python, CPU only.
+# Trained from the accumulated deals.json history, using the fields earlier runs filled in as labels:
+#     python title_model.py train [deals.json]
+# ai_parser runs it, within a per-run time budget, only over titles whose rules left fields empty, and only
+# fills those fields where it is confident; the rules' values always win.
+MODEL_FILEPATH = os.getenv("TITLE_MODEL_PATH", os.path.join('.cache', 'title_model.json'))
+MODEL_FORMAT = 1
+# Seconds of inference allowed per scraper run; titles past the budget use the rules only
+RUN_BUDGET = float(os.getenv("TITLE_MODEL_BUDGET", "10"))
+# Minimum probability (softmax over perceptron scores) for a predicted field to replace the rules' value
+CONFIDENCE_THRESHOLD = float(os.getenv("TITLE_MODEL_CONFIDENCE", "0.8"))
+TRAIN_EPOCHS = 8
+
+TAGS = ["O", "MAKE", "MODEL", "YEAR", "ROOMS", "AREA", "CITY"]
+
+_lock = threading.Lock()
+_model = None
+_loaded = False
+_spent = 0.0
+_budget = RUN_BUDGET
+_stats = {"predicted": 0, "over_budget": 0}
+
+
+class Perceptron:
+    """
+    Multi-class averaged perceptron over string features.
+    """
+
+    def __init__(self, classes, weights=None):
+        self.classes = list(classes)
+        self.weights = weights or {}   # {feature: {class: weight}}
+        self._totals = {}
+        self._stamps = {}
+        self._updates = 0
+
+    def scores(self, features):
+        scores = dict.fromkeys(self.classes, 0.0)
+        for feature in features:
+            for cls, weight in self.weights.get(feature, {}).items():
+                scores[cls] += weight
+        return scores
+
+    def predict(self, features):
+        """
+        (best class, its softmax probability).
+        """
+        scores = self.scores(features)
+        best = max(self.classes, key=lambda c: (scores[c], c == self.classes[0]))
+        top = scores[best]
+        total = sum(math.exp(score - top) for score in scores.values())
+        return best, 1.0 / total
+
+    def update(self, truth, guess, features):
+        self._updates += 1
+        if truth == guess:
+            return
+        for feature in features:
+            row = self.weights.setdefault(feature, {})
+            for cls, delta in ((truth, 1.0), (guess, -1.0)):
+                key = (feature, cls)
+                self._totals[key] = self._totals.get(key, 0.0) + (self._updates - self._stamps.get(key, 0)) * row.get(cls, 0.0)
+                self._stamps[key] = self._updates
+                row[cls] = row.get(cls, 0.0) + delta
+
+    def average(self):
+        for feature, row in self.weights.items():
+            for cls, weight in list(row.items()):
+                key = (feature, cls)
+                total = self._totals.get(key, 0.0) + (self._updates - self._stamps.get(key, 0)) * weight
+                averaged = round(total / max(1, self._updates), 4)
+                if averaged:
+                    row[cls] = averaged
+                else:
+                    del row[cls]
+        self.weights = {f: row for f, row in self.weights.items() if row}
+
+
+def _shape(token):
+    if token.kind == "number":
+        value = hebrew_text.number_value(token)
+        if len(token.norm) == 4 and token.norm.isdigit() and 1950 <= int(token.norm) <= 2035:
+            return "year"
+        if value is not None and value <= 12:
+            return "small"
+        return "number"
+    if token.norm.isascii():
+        return "latin"
+    return "hebrew"
+
+
+def _word_positions(title):
+    """
+    Indices of a title's number and word tokens in title.tokens (hebrew_text.tokenize_title()).
+    """
+    return [i for i, t in enumerate(title.tokens) if t.kind != "punct"]
+
+
+def token_features(words, i, prev_tag):
+    word = words[i]
+    stem = hebrew_text.forms(word)[-1]
+    features = ["bias", f"w={word.norm}", f"stem={stem}", f"shape={_shape(word)}", f"pt={prev_tag}",
+                f"suffix={word.norm[-2:]}"]
+    for offset in (-2, -1, 1, 2):
+        j = i + offset
+        if 0 <= j < len(words):
+            features.append(f"w{offset}={hebrew_text.forms(words[j])[-1]}")
+            features.append(f"shape{offset}={_shape(words[j])}")
+        else:
+            features.append(f"w{offset}=<edge>")
+    return features
+
+
+def title_features(words):
+    stems = [hebrew_text.forms(t)[-1] for t in words]
+    return ["bias"] + [f"s={s}" for s in stems] + [f"b={a}_{b}" for a, b in zip(stems, stems[1:])]
+
+
+class TitleModel:
+    def __init__(self, tagger, classifier):
+        self.tagger = tagger
+        self.classifier = classifier
+
+    def tag(self, words):
+        tags, probs, prev = [], [], "<start>"
+        for i in range(len(words)):
+            tag, prob = self.tagger.predict(token_features(words, i, prev))
+            tags.append(tag)
+            probs.append(prob)
+            prev = tag
+        return tags, probs
+
+    def predict(self, title):
+        """
+        {field: (value, confidence)} for the fields found in one title (a string or its
+        hebrew_text.tokenize_title()).
+        """
+        if isinstance(title, str):
+            title = hebrew_text.tokenize_title(title)
+        positions = _word_positions(title)
+        words = [title.tokens[p] for p in positions]
+        tags, probs = self.tag(words)
+        fields = {}
+        i = 0
+        while i < len(words):
+            if tags[i] == "O":
+                i += 1
+                continue
+            j = i
+            while j + 1 < len(words) and tags[j + 1] == tags[i]:
+                j += 1
+            field = tags[i].lower()
+            if field not in fields:
+                text = hebrew_text.surface(title.tokens[positions[i]:positions[j] + 1])
+                value = _field_value(field, text, words[i])
+                if value is not None:
+                    fields[field] = (value, min(probs[i:j + 1]))
+            i = j + 1
+        if self.classifier.classes:
+            category, prob = self.classifier.predict(title_features(words))
+            if category:
+                fields["category"] = (category, prob)
+        return fields
+
+    def to_json(self):
+        return {"format": MODEL_FORMAT, "tags": self.tagger.classes, "tagger": self.tagger.weights,
+                "classes": self.classifier.classes, "classifier": self.classifier.weights}
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(Perceptron(data["tags"], data["tagger"]), Perceptron(data["classes"], data["classifier"]))
+
+
+def _field_value(field, text, first_word):
+    if field == "year":
+        return int(first_word.norm) if first_word.norm.isdigit() else None
+    if field in ("rooms", "area"):
+        return hebrew_text.number_value(first_word)
+    if field == "city":
+        # The model tagged this span as the place, so ambiguous names don't need a prefix here
+        locality = gazetteer.find_locality(text, bare=True)
+        return locality.name if locality else text
+    return text
+
+
+def label_deal(deal):
+    """
+    Training example for one historical deal: (words, tags, category), tags taken from the fields
+    the rules extracted. Fields the model itself filled (deal["model_fields"]) are not labels, so the
+    model never trains on its own output. Returns None if the deal carries no usable label.
+    """
+    predicted = set(deal.get("model_fields") or ())
+
+    def label(field):
+        return None if field in predicted else deal.get(field)
+
+    title = hebrew_text.tokenize_title(deal.get("title", ""))
+    words = [title.tokens[p] for p in _word_positions(title)]
+    if not words:
+        return None
+    norms = title.words
+    tags = ["O"] * len(words)
+
+    def mark(phrase, tag):
+        phrase = hebrew_text.phrase_tokens(phrase) if isinstance(phrase, str) else phrase
+        if not phrase:
+            return False
+        for i in range(len(norms) - len(phrase) + 1):
+            if all(t == "O" for t in tags[i:i + len(phrase)]) and phrase[0] in hebrew_text.forms(norms[i]) \
+                    and tuple(norms[i + 1:i + len(phrase)]) == phrase[1:]:
+                tags[i:i + len(phrase)] = [tag] * len(phrase)
+                return True
+        return False
+
+    def mark_number(value, tag):
+        for i, word in enumerate(words):
+            if tags[i] == "O" and word.kind == "number" and hebrew_text.number_value(word) == value:
+                tags[i] = tag
+                return
+
+    if deal.get("type") == "car" and label("model"):
+        make, _, model = label("model").partition(" ")
+        if mark(make, "MAKE") and model:
+            mark(model, "MODEL")
+    if deal.get("type") == "equipment" and label("brand"):
+        mark(label("brand"), "MAKE")
+    if label("year"):
+        mark_number(float(label("year")), "YEAR")
+    if label("rooms"):
+        mark_number(float(label("rooms")), "ROOMS")
+    if label("area_sqm"):
+        mark_number(float(label("area_sqm")), "AREA")
+    if label("city"):
+        for first, end, locality in gazetteer.match_spans(norms):
+            if locality.name == label("city"):
+                tags[first:end] = ["CITY"] * (end - first)
+                break
+    category = label("category") or ""
+    if all(t == "O" for t in tags) and not category:
+        return None
+    return words, tags, category
+
+
+def train(deals, epochs=TRAIN_EPOCHS, seed=13):
+    examples = [ex for ex in (label_deal(d) for d in deals) if ex]
+    categories = sorted({category for _, _, category in examples})
+    tagger = Perceptron(TAGS)
+    # "" is the no-category class, listed first so it wins ties
+    classifier = Perceptron([""] + [c for c in categories if c]) if any(categories) else Perceptron([])
+    rng = random.Random(seed)
+    for _ in range(epochs):
+        rng.shuffle(examples)
+        for words, tags, category in examples:
+            prev = "<start>"
+            for i in range(len(words)):
+                features = token_features(words, i, prev)
+                guess, _ = tagger.predict(features)
+                tagger.update(tags[i], guess, features)
+                prev = tags[i]
+            if classifier.classes:
+                features = title_features(words)
+                guess, _ = classifier.predict(features)
+                classifier.update(category, guess, features)
+    tagger.average()
+    classifier.average()
+    return TitleModel(tagger, classifier), len(examples)
+
+
+def save(model, path=None):
+    path = path or MODEL_FILEPATH
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(model.to_json(), f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def get_model():
+    """
+    The trained model, or None if no usable model file exists.
+    """
+    global _model, _loaded
+    with _lock:
+        if not _loaded:
+            _loaded = True
+            if os.path.exists(MODEL_FILEPATH):
+                try:
+                    with open(MODEL_FILEPATH, 'r', encoding='utf-8') as f:
+                        data = json.load(f)
+                    if data.get("format") == MODEL_FORMAT:
+                        _model = TitleModel.from_json(data)
+                    else:
+                        logging.warning(f"Ignoring title model with format {data.get('format')}, retrain it")
+                except Exception as e:
+                    logging.warning(f"Ignoring unreadable title model: {e}")
+        return _model
+
+
+def start_run(budget=RUN_BUDGET):
+    """
+    Reset the per-run inference budget.
+    """
+    global _spent, _budget
+    with _lock:
+        _spent = 0.0
+        _budget = budget
+        _stats.update(predicted=0, over_budget=0)
+
+
+def predict_batch(titles):
+    """
+    Predictions for a batch of titles (strings or hebrew_text.tokenize_title()), in order. Titles reached
+    after the run budget is used up (and every title, when there is no model) get None.
+    """
+    global _spent
+    model = get_model()
+    if model is None:
+        return [None] * len(titles)
+    predictions = []
+    started = time.monotonic()
+    for title in titles:
+        with _lock:
+            over = _spent + (time.monotonic() - started) >= _budget
+            if over:
+                _stats["over_budget"] += 1
+        if over:
+            predictions.append(None)
+            continue
+        try:
+            predictions.append(model.predict(title or ""))
+        except Exception as e:
+            logging.warning(f"Title model failed on '{title if isinstance(title, str) else title.folded}': {e}")
+            predictions.append(None)
+    with _lock:
+        _spent += time.monotonic() - started
+        _stats["predicted"] += sum(p is not None for p in predictions)
+    return predictions
+
+
+def confident(prediction, field, threshold=None):
+    """
+    The predicted value of a field if its confidence reaches the threshold, else None.
+    """
+    if not prediction or field not in prediction:
+        return None
+    value, confidence = prediction[field]
+    return value if confidence >= (CONFIDENCE_THRESHOLD if threshold is None else threshold) else None
+
+
+def get_stats():
+    with _lock:
+        return dict(_stats, seconds=round(_spent, 3))
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] != "train":
+        print("usage: python title_model.py train [deals.json]")
+        return
+    deals_path = sys.argv[2] if len(sys.argv) > 2 else 'deals.json'
+    with open(deals_path, 'r', encoding='utf-8') as f:
+        deals = json.load(f)
+    model, count = train(deals)
+    if not count:
+        print(f"No labelled titles in {deals_path}, model not written")
+        return
+    save(model)
+    print(f"Trained on {count} labelled titles from {deals_path} -> {MODEL_FILEPATH}")
+
+
+if __name__ == "__main__":
+    main()